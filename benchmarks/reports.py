@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+'''
+Latency of the hired_employees report queries before and after the sargable
+date ranges and the indexes declared on HiredEmployees.
+
+The data is generated server-side in a separate `benchmark` schema of the configured
+database, so the application tables are not touched. Run it from the root directory:
+
+    python -m benchmarks.reports --rows 10000000 --repeat 5
+
+For each report it prints the median latency of:
+    - before: `extract('year', datetime) == year` without the indexes.
+    - after:  `start <= datetime < end` with the indexes.
+
+Results with 10M rows, year 2021 and 5 repetitions (PostgreSQL 16, 1 vCPU, 5 GB RAM):
+
+    query              before (ms)    after (ms)   speedup
+    by_quarter              3584.3        1460.4      2.5x
+    above_average           2974.2         710.2      4.2x
+    total                   2944.7         369.4      8.0x
+
+The served quarterly report reads the `hires_rollup` table instead, see HiresRollup.
+'''
+import argparse
+from time import perf_counter
+from statistics import median
+from datetime import datetime
+from sqlalchemy import MetaData, case, extract, func, select, text
+from src.connectors.db_connect import ENGINE, BASE
+from src.connectors.application_tables.hired_employees import year_range
+
+SCHEMA = 'benchmark'
+
+
+def create_tables(rows: int):
+    '''Copy the application tables into the `benchmark` schema and fill them.'''
+    metadata = MetaData()
+    tables = {
+        name: BASE.metadata.tables[name].to_metadata(metadata, schema=SCHEMA)
+        for name in ('departments', 'jobs', 'hired_employees')
+        }
+    with ENGINE.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+        metadata.create_all(conn)
+        conn.execute(text(f"INSERT INTO {SCHEMA}.departments SELECT g, 'Department ' || g FROM generate_series(1, 12) g"))
+        conn.execute(text(f"INSERT INTO {SCHEMA}.jobs SELECT g, 'Job ' || g FROM generate_series(1, 183) g"))
+        conn.execute(text(f'''
+            INSERT INTO {SCHEMA}.hired_employees (id, name, datetime, department_id, job_id)
+            SELECT g, 'Employee ' || g,
+                   timestamp '2016-01-01' + random() * interval '8 years',
+                   1 + floor(random() * 12)::int,
+                   1 + floor(random() * 183)::int
+            FROM generate_series(1, :rows) g
+            '''), {'rows': rows})
+    return tables
+
+
+def set_indexes(tables: dict, enabled: bool):
+    '''Create or drop the indexes of hired_employees, then refresh the statistics.'''
+    with ENGINE.begin() as conn:
+        for index in tables['hired_employees'].indexes:
+            if enabled:
+                index.create(conn, checkfirst=True)
+            else:
+                index.drop(conn, checkfirst=True)
+    with ENGINE.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text(f'VACUUM ANALYZE {SCHEMA}.hired_employees'))
+
+
+def report_queries(tables: dict, year: int, sargable: bool) -> dict:
+    '''Statements of the reports, filtering the year with `extract` or with a half-open range.'''
+    hired_employees, departments = tables['hired_employees'], tables['departments']
+    if sargable:
+        start, end = year_range(year)
+        in_year = [hired_employees.c.datetime >= start, hired_employees.c.datetime < end]
+    else:
+        in_year = [extract('year', hired_employees.c.datetime) == year]
+    quarter = extract('quarter', hired_employees.c.datetime)
+    return {
+        'by_quarter': select(
+            hired_employees.c.department_id, hired_employees.c.job_id,
+            *[func.sum(case((quarter == q, 1), else_=0)) for q in (1, 2, 3, 4)]
+            ).where(*in_year).group_by(hired_employees.c.department_id, hired_employees.c.job_id),
+        'above_average': select(departments.c.id, func.count())
+            .join(hired_employees, departments.c.id == hired_employees.c.department_id)
+            .where(*in_year).group_by(departments.c.id),
+        'total': select(func.count()).select_from(hired_employees).where(*in_year),
+        }
+
+
+def measure(statement, repeat: int) -> float:
+    '''Median latency of `statement` in milliseconds.'''
+    timings = []
+    with ENGINE.connect() as conn:
+        for _ in range(repeat):
+            start = perf_counter()
+            conn.execute(statement).all()
+            timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--year', type=int, default=2021)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark schema.')
+    args = parser.parse_args()
+
+    print(f'{datetime.now():%H:%M:%S} Generating {args.rows} rows...')
+    tables = create_tables(args.rows)
+    try:
+        set_indexes(tables, False)
+        before = {name: measure(stmt, args.repeat) for name, stmt in report_queries(tables, args.year, False).items()}
+        set_indexes(tables, True)
+        after = {name: measure(stmt, args.repeat) for name, stmt in report_queries(tables, args.year, True).items()}
+    finally:
+        if not args.keep:
+            with ENGINE.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+
+    print(f'{"query":<16}{"before (ms)":>14}{"after (ms)":>14}{"speedup":>10}')
+    for name in before:
+        print(f'{name:<16}{before[name]:>14.1f}{after[name]:>14.1f}{before[name] / after[name]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,474 @@
+import io
+import os
+import psycopg2
+from typing import Optional
+from abc import abstractmethod
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import values as sqlalchemy_values
+from sqlalchemy import BigInteger, Column, Integer, MetaData, SmallInteger, String, Table, column, exists, or_, select
+from src.connectors.db_connect import ENGINE, ASYNC_ENGINE, mark_write
+from src.settings import INSERT_CHUNK_SIZE
+from src.connectors.application_tables.csv_stream import iter_csv_batches, spool_upload
+from src.connectors.application_tables.parallel_parse import iter_parsed_batches
+from src.connectors.application_tables.ndjson_stream import iter_ndjson_batches
+from src.connectors.application_tables.reference_index import ReferenceIndex
+from src.connectors.application_tables.report_cache import ReportCache
+
+IMPORT_MODES = ('row', 'copy')
+COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather', '.ipc')
+# Bits of the integer column types, the most specific first.
+INTEGER_BITS = ((BigInteger, 64), (SmallInteger, 16), (Integer, 32))
+
+
+def integer_range(column_type) -> Optional[tuple]:
+    """`(min, max)` values accepted by PostgreSQL for an integer column type, None for other types."""
+    for sql, bits in INTEGER_BITS:
+        if isinstance(column_type, sql):
+            return -2 ** (bits - 1), 2 ** (bits - 1) - 1
+    return None
+
+
+class ImportReport:
+    """
+    Collects the outcome of an import as the `{'valids', 'invalids'}` report.
+    With `summary`, valid rows are only counted, so the report does not grow with the file.
+    """
+
+    def __init__(self, summary: bool = False):
+        self.summary = summary
+        self.valids = []
+        self.invalids = []
+        self.valid_count = 0
+        self.invalid_count = 0
+
+    def valid(self, record: dict):
+        self.valid_count += 1
+        if not self.summary:
+            self.valids.append(record)
+
+    def valid_rows(self, rows: list, to_record):
+        """Add the inserted `rows`, converting them with `to_record` only when they are kept."""
+        self.valid_count += len(rows)
+        if not self.summary:
+            self.valids.extend(to_record(row) for row in rows)
+
+    def invalid(self, record: dict):
+        self.invalid_count += 1
+        self.invalids.append(record)
+
+    def to_dict(self) -> dict:
+        return {
+            'valids': self.valid_count if self.summary else self.valids,
+            'invalids': self.invalids
+            }
+
+
+class BulkLoader:
+    """
+    A base class providing the CSV import operations for the application tables.
+    To use this as the second parent class, do as follows:
+    Example: class MyTable(BASE, BulkLoader)
+    The table declares the CSV column order in `__import_columns__` and implements
+    `parse_row` (raw CSV row -> column values) and `to_record` (returned row -> report item).
+    Lists of pydantic models from the JSON endpoints are inserted with `insert_models`.
+
+    Two import modes are available:
+    - `row`: one `INSERT ... RETURNING` per CSV row.
+    - `copy`: rows are pushed with PostgreSQL `COPY` into a temporary staging table and
+      merged into the target table with a single `INSERT ... SELECT ... ON CONFLICT DO NOTHING`
+      per batch. Foreign keys are checked in the merge, so rows breaking a constraint are
+      skipped instead of aborting the batch, and reported back as invalids.
+    """
+    __import_columns__: tuple = ()
+
+    @classmethod
+    @abstractmethod
+    def parse_row(cls, element: list) -> dict:
+        """Convert a raw CSV row into the column values to insert."""
+
+    @classmethod
+    @abstractmethod
+    def to_record(cls, row) -> dict:
+        """Convert an inserted row into the item reported in `valids`."""
+
+    @classmethod
+    def raw_record(cls, element: list) -> dict:
+        """Convert a raw CSV row into the item reported in `invalids`."""
+        return dict(zip(cls.__import_columns__, element))
+
+    @classmethod
+    async def instert_from_csv(cls, file, mode: str = 'row', summary: bool = False, progress=None, parallel: bool = False):
+        """
+        Import an uploaded CSV file.
+        The file is read in chunks and its rows reach the database in batches of `BULK_BATCH_SIZE`,
+        so memory stays flat whatever the file size. With `summary` only the number of valid rows
+        is reported instead of the rows themselves.
+        With `parallel`, the file is split into byte ranges that are parsed in the process pool.
+        Otherwise batches are parsed and loaded together in a worker thread, so the event loop
+        stays free during the import either way.
+        `progress`, when given, is called with the `ImportReport` after each batch.
+        """
+        report = ImportReport(summary=summary)
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Import mode '{mode}' not supported, use one of {IMPORT_MODES}")
+        if file.filename.lower().endswith(COLUMNAR_EXTENSIONS):
+            await cls.import_columnar(file, report, progress)
+        elif file.filename.lower().endswith('.csv'):
+            path = await spool_upload(file) if parallel else None
+            try:
+                if parallel:
+                    batches, load = iter_parsed_batches(cls, path), cls.load_parsed
+                else:
+                    batches, load = iter_csv_batches(file), cls.load_rows
+                async for batch in batches:
+                    await run_in_threadpool(load, batch, report, mode)
+                    if progress:
+                        progress(report)
+            finally:
+                if path:
+                    os.remove(path)
+        return report.to_dict()
+
+    @classmethod
+    async def import_columnar(cls, file, report, progress=None):
+        """
+        Import an uploaded Parquet or Arrow IPC file.
+        Record batches are validated and pushed to `COPY` column-wise, without a per-row Python
+        loop, and typed timestamps are used as they are. Columnar files are always bulk loaded.
+        """
+        from src.connectors.application_tables.columnar_import import iter_record_batches, load_record_batch
+        path = await spool_upload(file)
+        batches = iter_record_batches(path)
+        try:
+            line = 0
+            while True:
+                batch = await run_in_threadpool(next, batches, None)
+                if batch is None:
+                    break
+                await run_in_threadpool(load_record_batch, cls, batch, line, report)
+                line += batch.num_rows
+                if progress:
+                    progress(report)
+        finally:
+            batches.close()
+            os.remove(path)
+
+    @classmethod
+    def parse_rows(cls, rows) -> list:
+        """
+        Parse raw CSV rows into `(raw row, parsed row)` pairs; the parsed row is None when
+        `parse_row` fails.
+        """
+        parsed = []
+        for element in rows:
+            try:
+                parsed.append((element, cls.parse_row(element)))
+            except Exception as e:
+                parsed.append((element, None))
+        return parsed
+
+    @classmethod
+    def load_rows(cls, rows: list, report, mode: str = 'copy'):
+        """Parse a batch of raw CSV rows and load it, adding the outcome to `report`."""
+        cls.load_parsed(cls.parse_rows(rows), report, mode)
+
+    @classmethod
+    def load_parsed(cls, parsed: list, report, mode: str = 'copy'):
+        """
+        Load a batch of `(raw row, parsed row)` pairs, adding the outcome to `report`.
+        Rows that could not be parsed or reference missing keys are reported without reaching
+        the database.
+        """
+        batch = []
+        for line, (element, values) in enumerate(parsed, start=1):
+            if values is not None and cls.check_values(values) and cls.check_references(values):
+                batch.append((line, element, values))
+            else:
+                report.invalid(cls.raw_record(element))
+        if not batch:
+            return
+        if mode == 'copy':
+            cls.copy_batch(batch, report)
+        else:
+            cls.insert_batch(batch, report)
+
+    @classmethod
+    def insert_batch(cls, batch: list, report):
+        """
+        Insert a batch of `(line, raw row, parsed row)` one by one, adding the outcome of each one to `report`.
+        """
+        for _, element, values in batch:
+            try:
+                stmt = insert(cls).values(**values).returning(cls)
+                with ENGINE.begin() as conn:
+                    query_result = conn.execute(stmt).fetchone()
+                    cls._on_insert(conn, [query_result])
+                cls._after_commit([query_result])
+                report.valid(cls.to_record(query_result))
+            except Exception as e:
+                report.invalid(cls.raw_record(element))
+
+    @classmethod
+    def copy_batch(cls, batch: list, report):
+        """
+        Copy one batch of `(line, raw row, parsed row)` into the staging table and merge it.
+        Rows are matched back to the merge output by primary key; for repeated keys in the
+        batch only the first occurrence is attempted.
+        A value rejected by PostgreSQL despite `check_values` fails the whole `COPY`; the batch is
+        then loaded row by row, so only the offending rows are reported as invalids.
+        """
+        columns = list(cls.__import_columns__)
+        buffer = _copy_buffer([line, *(parsed[name] for name in columns)] for line, _, parsed in batch)
+        try:
+            inserted = cls.copy_merge(buffer, columns)
+        except (DataError, psycopg2.DataError):
+            cls.insert_batch(batch, report)
+            return
+        cls._report_merge(inserted, batch, cls._match_key(columns), report, cls.raw_record)
+
+    @classmethod
+    def copy_merge(cls, buffer, columns: list, copy_options: str = '') -> list:
+        """
+        `COPY` the `(_line, *columns)` rows of `buffer` into a staging table and merge them into
+        the table in a single transaction. Returns the inserted rows.
+        `copy_options` is appended to the `COPY` statement, e.g. `WITH (FORMAT csv)`.
+        """
+        stage = cls._stage_table()
+        with ENGINE.begin() as conn:
+            stage.create(conn)
+            quote = conn.dialect.identifier_preparer.quote
+            cursor = conn.connection.cursor()
+            cursor.copy_expert(
+                f"COPY {quote(stage.name)} (_line, {', '.join(quote(name) for name in columns)}) FROM STDIN {copy_options}",
+                buffer
+            )
+            inserted = conn.execute(cls._merge_statement(stage, columns)).fetchall()
+            cls._on_insert(conn, inserted)
+        cls._after_commit(inserted)
+        return inserted
+
+    @classmethod
+    def insert_models(cls, elements: list, chunk_size: int = INSERT_CHUNK_SIZE) -> dict:
+        """
+        Insert a list of pydantic models with multi-row `INSERT ... SELECT FROM (VALUES ...)
+        ON CONFLICT DO NOTHING RETURNING` statements of at most `chunk_size` rows, one transaction
+        per chunk. Models are grouped by the columns they set, so unset columns keep their defaults.
+        Models out of the column bounds or referencing missing keys are rejected before any SQL runs,
+        and models that are not returned by the insert are reported as invalids.
+        """
+        report = ImportReport()
+        for start in range(0, len(elements), chunk_size):
+            groups = cls._group_models(elements[start:start + chunk_size], report)
+            merged = []
+            with ENGINE.begin() as conn:
+                for columns, batch in groups.items():
+                    inserted = conn.execute(cls._merge_statement(cls._values_source(columns, batch), list(columns))).fetchall()
+                    cls._on_insert(conn, inserted)
+                    merged.append((inserted, batch, cls._match_key(columns)))
+            cls._report_merges(merged, report)
+        return report.to_dict()
+
+    @classmethod
+    async def async_insert_models(cls, elements: list, chunk_size: int = INSERT_CHUNK_SIZE) -> dict:
+        """
+        Async version of `insert_models`, running the statements through the asyncio engine.
+        The foreign key checks and the post-commit hooks may reload the `ReferenceIndex` or reach
+        Redis with blocking clients, so they run in the threadpool.
+        """
+        report = ImportReport()
+        for start in range(0, len(elements), chunk_size):
+            groups = await run_in_threadpool(cls._group_models, elements[start:start + chunk_size], report)
+            merged = []
+            async with ASYNC_ENGINE.begin() as conn:
+                for columns, batch in groups.items():
+                    result = await conn.execute(cls._merge_statement(cls._values_source(columns, batch), list(columns)))
+                    inserted = result.fetchall()
+                    await conn.run_sync(cls._on_insert, inserted)
+                    merged.append((inserted, batch, cls._match_key(columns)))
+            await run_in_threadpool(cls._report_merges, merged, report)
+        return report.to_dict()
+
+    @classmethod
+    def _group_models(cls, elements: list, report) -> dict:
+        """
+        Convert the models of a chunk into `(line, model, values)` grouped by the columns they set.
+        Models out of the column bounds or referencing missing keys are reported as invalids.
+        """
+        groups = {}
+        for line, element in enumerate(elements, start=1):
+            values = cls.from_model(element)
+            if not (cls.check_values(values) and cls.check_references(values)):
+                report.invalid(dict(element))
+                continue
+            columns = tuple(name for name in cls.__table__.columns.keys() if name in values)
+            groups.setdefault(columns, []).append((line, element, values))
+        return groups
+
+    @classmethod
+    def _values_source(cls, columns: tuple, batch: list):
+        """Multi-row `VALUES` of a group of models, with their line in the `_line` column."""
+        table = cls.__table__
+        return sqlalchemy_values(
+            column('_line', BigInteger),
+            *[column(name, table.c[name].type) for name in columns],
+            name='_batch'
+            ).data([(line, *(values[name] for name in columns)) for line, _, values in batch])
+
+    @classmethod
+    def _report_merges(cls, merged: list, report):
+        for inserted, batch, key in merged:
+            cls._after_commit(inserted)
+            cls._report_merge(inserted, batch, key, report, dict)
+
+    @classmethod
+    async def stream_models(cls, chunks, structure, chunk_size: int = INSERT_CHUNK_SIZE):
+        """
+        Validate and insert an NDJSON feed of `structure` objects read from the byte `chunks`,
+        in batches of `chunk_size` lines, and yield the `{'batch', 'valids', 'invalids'}` report
+        of each batch as soon as it is inserted. Memory stays constant whatever the feed length.
+        """
+        batch_number = 0
+        async for models, invalids in iter_ndjson_batches(chunks, structure, chunk_size):
+            batch_number += 1
+            result = {'valids': [], 'invalids': []}
+            if models:
+                result = await cls.async_insert_models(models, chunk_size)
+            yield {
+                'batch': batch_number,
+                'valids': result['valids'],
+                'invalids': invalids + result['invalids']
+                }
+
+    @classmethod
+    def from_model(cls, element) -> dict:
+        """Convert a pydantic model into the column values to insert, leaving unset columns out."""
+        return {key: value for key, value in dict(element).items() if value is not None}
+
+    @classmethod
+    def check_values(cls, values: dict) -> bool:
+        """
+        Check `values` against the bounds of their columns: the range of the integer types and the
+        length of the strings. Returns False for a value PostgreSQL would reject.
+        """
+        columns = cls.__table__.columns
+        for name, value in values.items():
+            if value is None or name not in columns:
+                continue
+            column_type = columns[name].type
+            bounds = integer_range(column_type)
+            if bounds is not None and isinstance(value, int) and not bounds[0] <= value <= bounds[1]:
+                return False
+            if isinstance(column_type, String) and column_type.length and len(str(value)) > column_type.length:
+                return False
+        return True
+
+    @classmethod
+    def check_references(cls, values: dict) -> bool:
+        """
+        Check the foreign keys of `values` against the in-memory `ReferenceIndex`.
+        Returns True if every foreign key is null or exists; otherwise, False.
+        """
+        for foreign_key in cls.__table__.foreign_keys:
+            value = values.get(foreign_key.parent.name)
+            if value is not None and value not in ReferenceIndex.of(foreign_key.column):
+                return False
+        return True
+
+    @classmethod
+    def _on_insert(cls, conn, rows: list):
+        """Called with the connection and the inserted rows, inside the transaction that inserts them."""
+        pass
+
+    @classmethod
+    def _after_commit(cls, rows: list):
+        """Called with the rows inserted by each committed transaction."""
+        ReferenceIndex.inserted(cls.__table__, rows)
+        if rows:
+            mark_write()
+            ReportCache.invalidate()
+
+    @classmethod
+    def _match_key(cls, columns) -> list:
+        """
+        Columns used to match inserted rows back to their input: the primary key when it is
+        provided, otherwise the unique columns.
+        """
+        table = cls.__table__
+        primary_key = [column.name for column in table.primary_key]
+        if all(name in columns for name in primary_key):
+            return primary_key
+        return [column.name for column in table.columns if column.unique and column.name in columns]
+
+    @classmethod
+    def _report_merge(cls, inserted: list, batch: list, key: list, report, describe):
+        """
+        Add the outcome of a merge to `report`. Each `(line, raw, values)` of `batch` is valid when a
+        returned row has its `key`; for repeated keys only the first occurrence is valid.
+        Invalid items are reported as `describe(raw)`.
+        """
+        inserted = {tuple(getattr(row, name) for name in key): row for row in inserted}
+        for _, raw, values in batch:
+            row = inserted.pop(tuple(values.get(name) for name in key), None)
+            if row is not None:
+                report.valid(cls.to_record(row))
+            else:
+                report.invalid(describe(raw))
+
+    @classmethod
+    def _stage_table(cls) -> Table:
+        """Temporary table mirroring the target columns, dropped when the transaction ends."""
+        return Table(
+            f'_stage_{cls.__tablename__}',
+            MetaData(),
+            Column('_line', BigInteger),
+            *[Column(column.name, column.type) for column in cls.__table__.columns],
+            prefixes=['TEMPORARY'],
+            postgresql_on_commit='DROP',
+        )
+
+    @classmethod
+    def _merge_statement(cls, source, columns: list):
+        """
+        Build the set-based `INSERT ... SELECT` moving the valid rows of `source` into the table.
+        Duplicated primary keys are first reduced to their first line, then the rows whose foreign
+        keys do not exist are filtered out and unique violations are skipped by `ON CONFLICT DO NOTHING`.
+        A later duplicate is thus never inserted in place of a rejected first line.
+        """
+        table = cls.__table__
+        primary_key = [source.c[column.name] for column in table.primary_key if column.name in columns]
+        if primary_key:
+            source = select(source).distinct(*primary_key).order_by(*primary_key, source.c._line).subquery()
+        conditions = []
+        for foreign_key in table.foreign_keys:
+            if foreign_key.parent.name in columns:
+                value = source.c[foreign_key.parent.name]
+                conditions.append(or_(value.is_(None), exists().where(foreign_key.column == value)))
+        rows = select(*[source.c[name] for name in columns]).where(*conditions)
+        return pg_insert(table) \
+            .from_select(columns, rows) \
+            .on_conflict_do_nothing() \
+            .returning(*table.columns)
+
+
+def _copy_value(value) -> str:
+    """Encode a value for the `COPY` text format."""
+    if value is None:
+        return '\\N'
+    return str(value) \
+        .replace('\\', '\\\\') \
+        .replace('\t', '\\t') \
+        .replace('\n', '\\n') \
+        .replace('\r', '\\r')
+
+
+def _copy_buffer(rows) -> io.StringIO:
+    """Write `rows` into an in-memory buffer in the `COPY` text format."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
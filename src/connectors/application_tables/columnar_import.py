@@ -0,0 +1,130 @@
+import io
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import DateTime, Integer, String
+from src.settings import BULK_BATCH_SIZE
+from src.connectors.application_tables.reference_index import ReferenceIndex
+from src.connectors.application_tables.bulk_loader import integer_range
+
+ARROW_TYPES = {
+    Integer: pa.int32(),
+    String: pa.string(),
+    DateTime: pa.timestamp('us'),
+    }
+
+
+def iter_record_batches(path: str, batch_size: int = BULK_BATCH_SIZE):
+    """
+    Yield the record batches of a Parquet (`.parquet`) or Arrow IPC file (file or stream format),
+    in slices of at most `batch_size` rows.
+    """
+    if path.lower().endswith('.parquet'):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path) as source:
+        try:
+            reader = ipc.open_file(source)
+            batches = (reader.get_batch(position) for position in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = ipc.open_stream(source)
+        for batch in batches:
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size)
+
+
+def arrow_schema(entity) -> pa.Schema:
+    """Arrow schema of the `__import_columns__` of `entity`."""
+    columns = entity.__table__.columns
+    return pa.schema([
+        (name, next(arrow for sql, arrow in ARROW_TYPES.items() if isinstance(columns[name].type, sql)))
+        for name in entity.__import_columns__
+        ])
+
+
+def in_bounds_mask(entity, table: pa.Table):
+    """
+    Boolean mask of the rows whose values fit the bounds of their columns (range of the integer
+    types, length of the strings), computed column-wise before the cast to the table types.
+    """
+    mask = pa.array(np.ones(table.num_rows, dtype=bool))
+    for name in entity.__import_columns__:
+        column_type, values = entity.__table__.columns[name].type, table[name]
+        bounds = integer_range(column_type)
+        if bounds is not None and (pa.types.is_integer(values.type) or pa.types.is_floating(values.type)):
+            fits = pc.and_(pc.greater_equal(values, bounds[0]), pc.less_equal(values, bounds[1]))
+        elif isinstance(column_type, String) and column_type.length and pa.types.is_string(values.type):
+            fits = pc.less_equal(pc.utf8_length(values), column_type.length)
+        else:
+            continue
+        mask = pc.and_(mask, pc.fill_null(fits, True))
+    return mask
+
+
+def valid_rows_mask(entity, table: pa.Table):
+    """
+    Boolean mask of the rows whose non-nullable columns are set and whose foreign keys exist
+    in the `ReferenceIndex`, computed column-wise.
+    """
+    mask = pa.array(np.ones(table.num_rows, dtype=bool))
+    for column in entity.__table__.columns:
+        if not column.nullable and column.name in table.column_names:
+            mask = pc.and_(mask, pc.is_valid(table[column.name]))
+    for foreign_key in entity.__table__.foreign_keys:
+        name = foreign_key.parent.name
+        if name not in table.column_names:
+            continue
+        index = ReferenceIndex.of(foreign_key.column)
+        values = table[name]
+        found = pc.is_in(values, value_set=pa.array(list(index.snapshot()), values.type))
+        if not pc.all(pc.or_(pc.is_null(values), found)).as_py() and index.refresh_if_stale():
+            found = pc.is_in(values, value_set=pa.array(list(index.snapshot()), values.type))
+        mask = pc.and_(mask, pc.or_(pc.is_null(values), found))
+    return mask
+
+
+def load_record_batch(entity, batch: pa.RecordBatch, line_offset: int, report):
+    """
+    Validate a record batch and bulk load it through `COPY ... WITH (FORMAT csv)`, adding the
+    outcome to `report`. Columns are selected by name and cast to the table types; tz-aware
+    timestamps are stored in UTC. Rows out of the column bounds are reported as invalids
+    instead of overflowing the cast.
+    Rows are matched back to the merge output by primary key, and for repeated keys in the batch
+    only the first occurrence is valid.
+    """
+    columns = list(entity.__import_columns__)
+    table = pa.Table.from_batches([batch]).select(columns)
+    table = table.add_column(0, '_line', pa.array(np.arange(line_offset, line_offset + table.num_rows)))
+    in_bounds = in_bounds_mask(entity, table)
+    rejected = [table.filter(pc.invert(in_bounds))]
+    table = table.filter(in_bounds)
+    table = table.cast(pa.schema([table.schema.field('_line'), *arrow_schema(entity)]))
+    mask = valid_rows_mask(entity, table)
+    candidates = table.filter(mask)
+    rejected.append(table.filter(pc.invert(mask)))
+
+    if candidates.num_rows:
+        buffer = io.BytesIO()
+        pa_csv.write_csv(candidates, buffer, pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        inserted = entity.copy_merge(buffer, columns, 'WITH (FORMAT csv)')
+
+        key = entity._match_key(columns)[0]
+        inserted_keys = pa.array([getattr(row, key) for row in inserted], candidates[key].type)
+        first_lines = candidates.group_by(key).aggregate([('_line', 'min')])['_line_min']
+        valid = pc.and_(
+            pc.is_in(candidates[key], value_set=inserted_keys),
+            pc.is_in(candidates['_line'], value_set=first_lines)
+            )
+        report.valid_rows(inserted, entity.to_record)
+        rejected.append(candidates.filter(pc.invert(valid)))
+
+    for invalids in rejected:
+        invalids = invalids.drop_columns(['_line'])
+        invalids = invalids.cast(pa.schema([(name, pa.string()) for name in invalids.column_names]))
+        for record in invalids.to_pylist():
+            report.invalid(record)
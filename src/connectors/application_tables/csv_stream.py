@@ -0,0 +1,62 @@
+import csv
+import codecs
+import tempfile
+from src.settings import BULK_BATCH_SIZE, IMPORT_CHUNK_SIZE
+
+
+async def iter_csv_records(file, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Read an `UploadFile` in chunks of `chunk_size` bytes and yield its complete CSV records.
+
+    Bytes are decoded incrementally, so multi-byte characters split between chunks are kept whole.
+    A record is complete once its quotes are balanced, so quoted fields containing line breaks
+    are not split. Only the current chunk and the pending record are held in memory.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    while True:
+        chunk = await file.read(chunk_size)
+        lines = (pending + decoder.decode(chunk, final=not chunk)).split('\n')
+        pending = lines.pop() if chunk else ''
+        record = ''
+        for line in lines:
+            record += line + '\n'
+            if record.count('"') % 2 == 0:
+                yield record
+                record = ''
+        pending = record + pending
+        if not chunk:
+            if pending:
+                yield pending
+            return
+
+
+async def iter_csv_batches(file, batch_size: int = BULK_BATCH_SIZE, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Yield the non-empty rows of an uploaded CSV file in lists of at most `batch_size` rows,
+    as soon as each batch is complete.
+    """
+    batch = []
+    async for record in iter_csv_records(file, chunk_size):
+        for element in csv.reader([record]):
+            if element != []:
+                batch.append(element)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def spool_upload(file, chunk_size: int = IMPORT_CHUNK_SIZE) -> str:
+    """
+    Copy an `UploadFile` in chunks into a named temporary file that outlives the request,
+    and return its path. The caller is responsible for removing it.
+    """
+    suffix = '.' + file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        chunk = await file.read(chunk_size)
+        while chunk:
+            spool.write(chunk)
+            chunk = await file.read(chunk_size)
+    return spool.name
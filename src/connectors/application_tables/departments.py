@@ -1,12 +1,12 @@
-import csv
-from sqlalchemy import insert
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String
-from src.connectors.db_connect import ENGINE, BASE, excecute
+from src.connectors.db_connect import ENGINE, BASE
+from src.connectors.application_tables.bulk_loader import BulkLoader
 
 
-class Department(BASE):
+class Department(BASE, BulkLoader):
     __tablename__ = 'departments'
+    __import_columns__ = ('id', 'department')
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     department = Column(String, unique=True)
@@ -23,54 +23,18 @@ class Department(BASE):
 
     @staticmethod
     async def insert_departments(departments: list):
-        result = {'valids':[], 'invalids':[]}
-        to_insert = []
-        obj = {}
-        for element in departments:
-            if element.id:
-                obj['id'] = element.id
-            obj['department'] = element.department
-            try:
-                stmt = insert(Department).values(**obj).returning(Department)
-                query_result = excecute(stmt).fetchone()
-                to_insert.append({
-                    'id':int(query_result[0]),
-                    'department':str(query_result[1])
-                    }
-                )
-            except Exception as e:
-                result['invalids'].append(
-                    {'id':element.id, 'department':element.department}
-                )
-            print(element)
-        result['valids'] = to_insert
-        return result
-
-
-    @staticmethod
-    async def instert_from_csv(file):
-        result = {'valids':[], 'invalids':[]}
-        f_content = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            to_insert = []
-            csvreaded = csv.reader(f_content.decode('utf-8').replace('\r\n', '\n').split('\n'))
-            for element in csvreaded:
-                try:
-                    stmt = insert(Department).values(
-                        id=int(element[0]),
-                        department=str(element[1])
-                        ).returning(Department)
-                    query_result = excecute(stmt).fetchall()
-                    if len(query_result) > 0:
-                        to_insert.append({
-                            'id':int(query_result[0][0]),
-                            'department':str(query_result[0][1])
-                            }
-                        )
-                except Exception as e:
-                    result['invalids'].append(
-                        {'id':element[0], 'department':element[1]}
-                    )
-                print(element)
-        result['valids'] = to_insert
-        return result
\ No newline at end of file
+        return await Department.async_insert_models(departments)
+
+    @classmethod
+    def parse_row(cls, element: list) -> dict:
+        return {
+            'id': int(element[0]),
+            'department': str(element[1])
+            }
+
+    @classmethod
+    def to_record(cls, row) -> dict:
+        return {
+            'id': int(row.id),
+            'department': str(row.department)
+            }
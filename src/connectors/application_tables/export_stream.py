@@ -0,0 +1,42 @@
+import io
+import csv
+import json
+from sqlalchemy import select
+from src.connectors.db_connect import read_engine
+from src.settings import EXPORT_BATCH_SIZE
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    }
+
+
+def entity_statement(entity):
+    """Statement exporting every row of `entity`, ordered by primary key."""
+    table = entity.__table__
+    return select(table).order_by(*table.primary_key.columns)
+
+
+def iter_export(statement, export_format: str = 'csv', batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Run `statement` with a server-side cursor and yield its rows encoded as CSV (with a header)
+    or NDJSON, one chunk per `batch_size` rows. Only one batch is held in memory.
+    The statement runs on a read replica when they are configured.
+    The format must be one of `EXPORT_FORMATS`.
+    """
+    with read_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+        columns = list(result.keys())
+        if export_format == 'csv':
+            yield encode_csv([columns])
+        for rows in result.partitions():
+            if export_format == 'csv':
+                yield encode_csv(rows)
+            else:
+                yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+
+def encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
@@ -1,13 +1,41 @@
-import csv
-from sqlalchemy import insert
+from typing import Optional
 from datetime import datetime
 from src.connectors.application_tables.jobs import Job
 from src.connectors.application_tables.departments import Department
-from src.connectors.db_connect import ENGINE, BASE, SESSION, excecute
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, extract, asc, func, case, desc
+from fastapi.concurrency import run_in_threadpool
+from src.connectors.db_connect import ENGINE, BASE, async_read_session, create_missing_indexes
+from src.settings import HIRES_ANALYTICS_ENABLED
+from src.connectors.application_tables.bulk_loader import BulkLoader
+from src.connectors.application_tables.hires_rollup import HiresRollup
+from src.connectors.application_tables.report_cache import ReportCache
+from sqlalchemy import Column, Integer, Numeric, String, DateTime, ForeignKey, Index, and_, case, cast, func, select
 
-class HiredEmployees(BASE):
+
+def parse_datetime(value: str) -> datetime:
+    '''
+    Parse an ISO 8601 timestamp into a naive datetime.
+    As PostgreSQL does for `timestamp without time zone`, the offset is ignored.
+    '''
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def year_range(year: int) -> tuple:
+    '''
+    Half-open `[start, end)` timestamp range of `year`. Filtering with
+    `start <= datetime < end` instead of `extract('year', datetime) == year` can use the indexes on `datetime`.
+    '''
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+class HiredEmployees(BASE, BulkLoader):
     __tablename__ = 'hired_employees'
+    __import_columns__ = ('id', 'name', 'datetime', 'department_id', 'job_id')
+    __table_args__ = (
+        # Range scans by year, covering department and job so the reports run as index-only scans.
+        Index('ix_hired_employees_datetime', 'datetime', postgresql_include=['department_id', 'job_id']),
+        Index('ix_hired_employees_department_id_datetime', 'department_id', 'datetime'),
+        Index('ix_hired_employees_job_id', 'job_id'),
+        )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True)
@@ -22,126 +50,142 @@ class HiredEmployees(BASE):
 
     @staticmethod
     def __create_all_schemas__():
-        '''Create table'''
+        '''Create table, and the indexes missing on an existing one without blocking its writes'''
         BASE.metadata.create_all(ENGINE)
+        create_missing_indexes(HiredEmployees.__table__)
 
 
     @staticmethod
     async def insert_hired_employees(hired_employees: list):
-        result = {'valids':[], 'invalids':[]}
-        to_insert = []
-        obj = {}
-        for element in hired_employees:
-            if element.id:
-                obj['id'] = element.id
-            if element.department_id:
-                obj['department_id'] = element.department_id
-            if element.job_id:
-                obj['job_id'] = element.job_id
-            obj['name'] = element.name
-            try:
-                stmt = insert(HiredEmployees).values(**obj).returning(HiredEmployees)
-                query_result = excecute(stmt).fetchone()
-                to_insert.append({
-                    'id': int(query_result[0]),
-                    'name': str(query_result[1]),
-                    'datetime': str(query_result[2]),
-                    'department_id': int(query_result[3]) if isinstance(query_result[3], int) else None,
-                    'job_id': int(query_result[4]) if isinstance(query_result[4], int) else None
-                    }
-                )
-            except Exception as e:
-                    result['invalids'].append(obj)
-            print(element)
-        result['valids'] = to_insert
-        return result
+        return await HiredEmployees.async_insert_models(hired_employees)
+
+    @classmethod
+    def from_model(cls, element) -> dict:
+        values = super().from_model(element)
+        values.setdefault('datetime', datetime.utcnow())
+        return values
+
+    @classmethod
+    def _on_insert(cls, conn, rows: list):
+        HiresRollup.add(conn, rows)
+
+    @classmethod
+    def _after_commit(cls, rows: list):
+        super()._after_commit(rows)
+        if HIRES_ANALYTICS_ENABLED:
+            from src.connectors.application_tables.hires_analytics import HiresAnalytics
+            HiresAnalytics.get().inserted(rows)
+
+    @classmethod
+    def parse_row(cls, element: list) -> dict:
+        return {
+            'id': int(element[0]),
+            'name': str(element[1]),
+            'datetime': parse_datetime(element[2]) if element[2] != '' else None,
+            'department_id': int(element[3]) if element[3].isdigit() else None,
+            'job_id': int(element[4]) if element[4].isdigit() else None
+            }
+
+    @classmethod
+    def to_record(cls, row) -> dict:
+        return {
+            'id': int(row.id),
+            'name': str(row.name),
+            'datetime': str(row.datetime),
+            'department_id': int(row.department_id) if isinstance(row.department_id, int) else None,
+            'job_id': int(row.job_id) if isinstance(row.job_id, int) else None
+            }
 
     @staticmethod
-    async def instert_from_csv(file):
-        result = {'valids':[], 'invalids':[]}
-        f_content = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            to_insert = []
-            csvreaded = csv.reader(f_content.decode('utf-8').replace('\r\n', '\n').split('\n'))
-            for element in csvreaded:
-                if element != []:
-                    try:
-                        stmt = insert(HiredEmployees).values(
-                            id= int(element[0]),
-                            name= str(element[1]),
-                            datetime= str(element[2]) if element[2] != '' else None,
-                            department_id= int(element[3]) if element[3].isdigit() else None,
-                            job_id= int(element[4]) if element[4].isdigit() else None
-                            ).returning(HiredEmployees)
-                        query_result = excecute(stmt).fetchone()
-                        to_insert.append({
-                            'id': int(query_result[0]),
-                            'name': str(query_result[1]),
-                            'datetime': str(query_result[2]),
-                            'department_id': int(query_result[3]) if isinstance(query_result[3], int) else None,
-                            'job_id': int(query_result[4]) if isinstance(query_result[4], int) else None
-                            }
-                        )
-                    except Exception as e:
-                            result['invalids'].append({
-                            'id': element[0],
-                            'name': element[1],
-                            'datetime': element[2],
-                            'department_id': element[3],
-                            'job_id': element[4]
-                            }
-                        )
-                    print(element)
-        result['valids'] = to_insert
-        return result
+    def by_quarter_statement(year: int = 2021):
+        '''Statement of the quarterly report, with the columns department, job, Q1, Q2, Q3 and Q4.'''
+        return select(Department.department, Job.job,
+                        func.sum(case((HiresRollup.quarter == 1, HiresRollup.hired), else_=0)).label('Q1'),
+                        func.sum(case((HiresRollup.quarter == 2, HiresRollup.hired), else_=0)).label('Q2'),
+                        func.sum(case((HiresRollup.quarter == 3, HiresRollup.hired), else_=0)).label('Q3'),
+                        func.sum(case((HiresRollup.quarter == 4, HiresRollup.hired), else_=0)).label('Q4')) \
+            .join(Department, HiresRollup.department_id == Department.id).join(Job, HiresRollup.job_id == Job.id) \
+            .where(HiresRollup.year == year) \
+            .group_by(Department.department, Job.job) \
+            .order_by(Department.department, Job.job)
 
     @staticmethod
+    @ReportCache.cached('hired_by_quarter')
     async def get_by_quarter(year:int = 2021):
-        session = SESSION()
+        if HIRES_ANALYTICS_ENABLED:
+            from src.connectors.application_tables.hires_analytics import HiresAnalytics
+            return await run_in_threadpool(HiresAnalytics.get().by_quarter, year)
         result = {'valids': [], 'invalids': []}
-        query = session.query(Department.department, Job.job,
-                        func.sum(case((extract('quarter', HiredEmployees.datetime) == 1, 1), else_=0)).label('q1'),
-                        func.sum(case((extract('quarter', HiredEmployees.datetime) == 2, 1), else_=0)).label('q2'),
-                        func.sum(case((extract('quarter', HiredEmployees.datetime) == 3, 1), else_=0)).label('q3'),
-                        func.sum(case((extract('quarter', HiredEmployees.datetime) == 4, 1), else_=0)).label('q4')) \
-        .join(Department, HiredEmployees.department_id == Department.id).join(Job,HiredEmployees.job_id == Job.id ) \
-        .filter(extract('year', HiredEmployees.datetime) == year) \
-        .group_by(Department.department, Job.job)
-
-        records = query.all()
+        async with async_read_session() as session:
+            records = (await session.execute(HiredEmployees.by_quarter_statement(year))).all()
 
-        result['valids'] = [{
-            'department': record[0],
-            'job': record[1],
-            'Q1': record[2],
-            'Q2': record[3],
-            'Q3': record[4],
-            'Q4': record[5],
-        } for record in records]
+        result['valids'] = [dict(record._mapping) for record in records]
         return result
 
     @staticmethod
-    async def get_departments_above_average(year: int = 2021):
-        session = SESSION()
+    @ReportCache.cached('departments_above_average')
+    async def get_departments_above_average(year: int = 2021, percentile: Optional[float] = None, top: Optional[int] = None):
+        '''
+        Departments that hired more employees in `year` than the mean of all the departments,
+        ordered by the number of hires (descending), in a single statement.
+        The mean is the total hires of the year (including those without department) divided by the
+        number of departments, rounded half to even like Python's `round`.
+        - percentile: Instead of the mean, keep the departments at or above this percentile (0-100)
+          of the hires per department.
+        - top: Keep only the `top` departments with most hires (ties included).
+        '''
+        if percentile is not None and not 0 <= percentile <= 100:
+            raise ValueError('percentile must be between 0 and 100')
+        if top is not None and top < 1:
+            raise ValueError('top must be greater than 0')
+        if HIRES_ANALYTICS_ENABLED:
+            from src.connectors.application_tables.hires_analytics import HiresAnalytics
+            return await run_in_threadpool(HiresAnalytics.get().above_average, year, percentile, top)
         result = {'valids': [], 'invalids': []}
-        total_employees = session.query(func.count(HiredEmployees.id)) \
-            .filter(extract('year', HiredEmployees.datetime) == year) \
-            .scalar()
-        total_departments = session.query(func.count(Department.id)).scalar()
-        mean = round(total_employees/total_departments)
+        start, end = year_range(year)
 
-        employee_counts = session.query(
-            Department.department,
+        total = select(func.count()).select_from(HiredEmployees) \
+            .where(HiredEmployees.datetime >= start, HiredEmployees.datetime < end) \
+            .scalar_subquery()
+
+        # Every department counts for the mean, including those without hires in the year.
+        counts = select(
             Department.id,
-            func.count(HiredEmployees.id).label('employee_count')
-        ).join(HiredEmployees, Department.id == HiredEmployees.department_id) \
-            .group_by(Department.department, Department.id) \
-            .all()
+            Department.department,
+            func.count(HiredEmployees.datetime).label('hired')
+        ).outerjoin(HiredEmployees, and_(
+            Department.id == HiredEmployees.department_id,
+            HiredEmployees.datetime >= start,
+            HiredEmployees.datetime < end
+        )).group_by(Department.id, Department.department) \
+            .subquery()
+
+        ranked = select(
+            counts,
+            (cast(total, Numeric) / func.count().over()).label('mean'),
+            func.percent_rank().over(order_by=counts.c.hired).label('percent_rank'),
+            func.rank().over(order_by=counts.c.hired.desc()).label('rank')
+        ).subquery()
+
+        query = select(ranked.c.id, ranked.c.department, ranked.c.hired)
+        if percentile is None:
+            # SQL `round` rounds halves away from zero, so ties are rounded to the even neighbour here.
+            floor = func.floor(ranked.c.mean)
+            mean = case((ranked.c.mean - floor == 0.5, floor + func.mod(floor, 2)), else_=func.round(ranked.c.mean))
+            query = query.where(ranked.c.hired > mean)
+        else:
+            query = query.where(ranked.c.percent_rank >= percentile / 100)
+        if top is not None:
+            query = query.where(ranked.c.rank <= top)
+        query = query.order_by(ranked.c.hired.desc(), ranked.c.id)
+
+        async with async_read_session() as session:
+            records = (await session.execute(query)).all()
 
         result['valids'] = [{
-            'id': record[1],
-            'department': record[0],
-            'hired': record[2],
-        } for record in employee_counts if record[2] > mean]
+            'id': record.id,
+            'department': record.department,
+            'hired': record.hired,
+        } for record in records]
 
         return result
@@ -0,0 +1,271 @@
+import io
+import threading
+from time import monotonic
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+from sqlalchemy import select
+from src.connectors.db_connect import read_engine
+from src.connectors.application_tables.jobs import Job
+from src.connectors.application_tables.departments import Department
+from src.settings import HIRES_ANALYTICS_TTL_SEC
+
+ARROW_COLUMNS = {
+    'id': pa.int32(),
+    'datetime': pa.timestamp('us'),
+    'department_id': pa.int32(),
+    'job_id': pa.int32(),
+    }
+
+
+def encode(column: pa.ChunkedArray) -> tuple:
+    """
+    Dictionary-encode an integer column. Returns the sorted distinct values and the
+    int32 code of each row, -1 for nulls.
+    """
+    valid = pc.is_valid(column).to_numpy(zero_copy_only=False)
+    values = pc.fill_null(column, 0).to_numpy()
+    dictionary, codes = np.unique(values[valid], return_inverse=True)
+    encoded = np.full(len(values), -1, np.int32)
+    encoded[valid] = codes
+    return dictionary.astype(np.int32), encoded
+
+
+class HiresAnalytics:
+    """
+    In-memory, columnar copy of `hired_employees` answering the hiring reports with NumPy,
+    without running GROUP BYs in PostgreSQL. Enabled with `HIRES_ANALYTICS_ENABLED`.
+
+    Columns are kept as arrays: int32 ids, datetime64 timestamps, and int32 codes into
+    the department and job dictionaries (-1 for nulls). Rows are sorted by timestamp, so every
+    year and quarter is a contiguous slice found with a binary search.
+    The table is loaded with a single COPY on first use and extended with the rows committed
+    through HiredEmployees. It is reloaded every `HIRES_ANALYTICS_TTL_SEC` seconds, so rows
+    inserted by other instances are picked up. Rows committed while the table is being copied
+    may be missing from the copy, so they are kept aside and appended after it.
+
+    Usage example:
+    --------------
+    ```
+        report = HiresAnalytics.get().by_quarter(2021)
+    ```
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.ids = np.empty(0, np.int32)
+        self.datetimes = np.empty(0, 'datetime64[us]')
+        self.department_codes = np.empty(0, np.int32)
+        self.job_codes = np.empty(0, np.int32)
+        self.departments = []
+        self.jobs = []
+        self._department_index = {}
+        self._job_index = {}
+        self._sorted_ids = self.ids
+        self._appended_ids = set()
+        self._pending = []
+        self._refreshing = 0
+        self._inserted_while_refreshing = []
+
+    @classmethod
+    def get(cls) -> 'HiresAnalytics':
+        """Return the shared engine, creating it if needed."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def refresh(self):
+        """Reload the whole table with `COPY ... TO STDOUT`."""
+        with self._lock:
+            self._refreshing += 1
+        try:
+            self._load()
+        finally:
+            with self._lock:
+                self._refreshing -= 1
+                if not self._refreshing:
+                    self._inserted_while_refreshing = []
+
+    def _load(self):
+        buffer = io.BytesIO()
+        with read_engine().connect() as conn:
+            conn.connection.cursor().copy_expert(
+                f"COPY hired_employees ({', '.join(ARROW_COLUMNS)}) TO STDOUT WITH (FORMAT csv)", buffer
+                )
+        buffer.seek(0)
+        if buffer.getbuffer().nbytes:
+            table = pa_csv.read_csv(
+                buffer,
+                read_options=pa_csv.ReadOptions(column_names=list(ARROW_COLUMNS)),
+                convert_options=pa_csv.ConvertOptions(column_types=ARROW_COLUMNS)
+                )
+        else:
+            table = pa.table({name: pa.array([], arrow_type) for name, arrow_type in ARROW_COLUMNS.items()})
+        departments, department_codes = encode(table['department_id'])
+        jobs, job_codes = encode(table['job_id'])
+        ids = table['id'].to_numpy()
+        datetimes = table['datetime'].to_numpy(zero_copy_only=False).astype('datetime64[us]')
+        order = np.argsort(datetimes, kind='stable')
+
+        with self._lock:
+            self.ids = ids[order]
+            self.datetimes = datetimes[order]
+            self.department_codes = department_codes[order]
+            self.job_codes = job_codes[order]
+            self.departments = departments.tolist()
+            self.jobs = jobs.tolist()
+            self._department_index = {value: code for code, value in enumerate(self.departments)}
+            self._job_index = {value: code for code, value in enumerate(self.jobs)}
+            self._sorted_ids = np.sort(ids)
+            self._appended_ids = set()
+            self._pending = []
+            self._loaded_at = monotonic()
+            # Rows committed since the copy started, the ones it already has are skipped.
+            self._append(self._inserted_while_refreshing)
+
+    def refresh_if_stale(self):
+        """Load the table on first use, and reload it when older than `HIRES_ANALYTICS_TTL_SEC`."""
+        if self._loaded_at is None or monotonic() - self._loaded_at >= HIRES_ANALYTICS_TTL_SEC:
+            self.refresh()
+
+    def inserted(self, rows: list):
+        """
+        Append the committed `rows` of `hired_employees`. Rows already loaded (e.g. committed
+        while the table was being copied) are skipped. Before the first load, only the rows
+        committed while it runs are kept, the later load copies the others.
+        """
+        with self._lock:
+            if self._refreshing:
+                self._inserted_while_refreshing.extend(rows)
+            if self._loaded_at is not None:
+                self._append(rows)
+
+    def _append(self, rows: list):
+        """Queue the `rows` not loaded yet to be merged into the columns. Called with the lock held."""
+        if not rows:
+            return
+        ids = np.array([row.id for row in rows], np.int32)
+        positions = np.searchsorted(self._sorted_ids, ids).clip(max=max(len(self._sorted_ids) - 1, 0))
+        loaded = self._sorted_ids[positions] == ids if len(self._sorted_ids) else np.zeros(len(ids), bool)
+        rows = [
+            row for row, is_loaded in zip(rows, loaded)
+            if not is_loaded and row.id not in self._appended_ids
+            ]
+        if not rows:
+            return
+        self._appended_ids.update(row.id for row in rows)
+        self._pending.append((
+            np.array([row.id for row in rows], np.int32),
+            np.array([row.datetime or 'NaT' for row in rows], 'datetime64[us]'),
+            np.array([self._code(self.departments, self._department_index, row.department_id) for row in rows], np.int32),
+            np.array([self._code(self.jobs, self._job_index, row.job_id) for row in rows], np.int32),
+            ))
+
+    @staticmethod
+    def _code(dictionary: list, index: dict, value) -> int:
+        if value is None:
+            return -1
+        if value not in index:
+            index[value] = len(dictionary)
+            dictionary.append(value)
+        return index[value]
+
+    def _columns(self) -> tuple:
+        """Return the current columns and dictionaries, merging the appended rows first."""
+        self.refresh_if_stale()
+        with self._lock:
+            if self._pending:
+                ids, datetimes, department_codes, job_codes = (np.concatenate(column) for column in zip(*self._pending))
+                order = np.argsort(datetimes, kind='stable')
+                positions = np.searchsorted(self.datetimes, datetimes[order], 'right')
+                self.ids = np.insert(self.ids, positions, ids[order])
+                self.datetimes = np.insert(self.datetimes, positions, datetimes[order])
+                self.department_codes = np.insert(self.department_codes, positions, department_codes[order])
+                self.job_codes = np.insert(self.job_codes, positions, job_codes[order])
+                self._pending = []
+            return (
+                self.datetimes, self.department_codes, self.job_codes,
+                np.array(self.departments, np.int32), np.array(self.jobs, np.int32)
+                )
+
+    @staticmethod
+    def _quarter_bounds(datetimes: np.ndarray, year: int) -> list:
+        """Positions where each quarter of `year` starts, and where the year ends."""
+        starts = [f'{year:04d}-01-01', f'{year:04d}-04-01', f'{year:04d}-07-01', f'{year:04d}-10-01', f'{year + 1:04d}-01-01']
+        return np.searchsorted(datetimes, np.array(starts, 'datetime64[us]')).tolist()
+
+    @staticmethod
+    def _names(entity, column) -> dict:
+        with read_engine().connect() as conn:
+            return dict(conn.execute(select(entity.id, column)).all())
+
+    def by_quarter(self, year: int = 2021) -> dict:
+        """Same result as `HiredEmployees.get_by_quarter`, computed with a single bincount."""
+        datetimes, department_codes, job_codes, departments, jobs = self._columns()
+        bounds = self._quarter_bounds(datetimes, year)
+        quarters = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            department_slice, job_slice = department_codes[start:end], job_codes[start:end]
+            keys = department_slice.astype(np.int64) * len(jobs) + job_slice
+            keys = keys[(department_slice >= 0) & (job_slice >= 0)]
+            quarters.append(np.bincount(keys, minlength=len(departments) * len(jobs)))
+        counts = np.stack(quarters, axis=1)
+        pairs = np.flatnonzero(counts.sum(axis=1))
+
+        department_names = self._names(Department, Department.department)
+        job_names = self._names(Job, Job.job)
+        records = []
+        for pair, (q1, q2, q3, q4) in zip(pairs.tolist(), counts[pairs].tolist()):
+            department_id, job_id = departments[pair // len(jobs)], jobs[pair % len(jobs)]
+            if department_id in department_names and job_id in job_names:
+                records.append((department_names[department_id], job_names[job_id], q1, q2, q3, q4))
+        records.sort(key=lambda record: (record[0], record[1]))
+
+        return {'valids': [{
+            'department': record[0],
+            'job': record[1],
+            'Q1': record[2],
+            'Q2': record[3],
+            'Q3': record[4],
+            'Q4': record[5],
+        } for record in records], 'invalids': []}
+
+    def above_average(self, year: int = 2021, percentile: float = None, top: int = None) -> dict:
+        """Same result as `HiredEmployees.get_departments_above_average`, computed with bincount and ranks."""
+        datetimes, department_codes, _, departments, _ = self._columns()
+        bounds = self._quarter_bounds(datetimes, year)
+        department_slice = department_codes[bounds[0]:bounds[-1]]
+        counts = np.bincount(department_slice[department_slice >= 0], minlength=len(departments))
+
+        # Every department counts, including those without hires.
+        department_names = self._names(Department, Department.department)
+        ids = np.array(sorted(department_names), np.int64)
+        hired = np.zeros(len(ids), np.int64)
+        if len(ids) and len(departments):
+            positions = np.searchsorted(ids, departments).clip(max=len(ids) - 1)
+            known = ids[positions] == departments
+            hired[positions[known]] = counts[known]
+        if not len(ids):
+            return {'valids': [], 'invalids': []}
+
+        ordered = np.sort(hired)
+        if percentile is None:
+            # Total hires of the year, including those without department, over the departments.
+            keep = hired > round((bounds[-1] - bounds[0]) / len(ids))
+        else:
+            keep = np.searchsorted(ordered, hired, 'left') / max(len(hired) - 1, 1) >= percentile / 100
+        if top is not None:
+            keep &= 1 + len(hired) - np.searchsorted(ordered, hired, 'right') <= top
+        ids, hired = ids[keep], hired[keep]
+        order = np.lexsort((ids, -hired))
+
+        return {'valids': [{
+            'id': department_id,
+            'department': department_names[department_id],
+            'hired': count,
+        } for department_id, count in zip(ids[order].tolist(), hired[order].tolist())], 'invalids': []}
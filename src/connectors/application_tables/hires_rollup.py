@@ -0,0 +1,81 @@
+from collections import Counter
+from sqlalchemy import Column, Integer, delete, extract, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src.connectors.db_connect import ENGINE, BASE
+
+
+class HiresRollup(BASE):
+    '''
+    Pre-aggregated number of hires per (year, quarter, department_id, job_id).
+    It is kept current by the insert and import paths of HiredEmployees, in the same transaction
+    as the inserted rows, so the quarterly report does not scan `hired_employees`.
+    Rows without datetime, department or job are not counted, as the report leaves them out.
+    '''
+    __tablename__ = 'hires_rollup'
+
+    year = Column(Integer, primary_key=True)
+    quarter = Column(Integer, primary_key=True)
+    department_id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, primary_key=True)
+    hired = Column(Integer, nullable=False, default=0)
+
+    @staticmethod
+    def __delete_schema__():
+        '''Delete table'''
+        BASE.metadata.tables['hires_rollup'].drop(ENGINE)
+
+    @staticmethod
+    def __create_all_schemas__():
+        '''Create table'''
+        BASE.metadata.create_all(ENGINE)
+
+    @staticmethod
+    def add(conn, rows: list):
+        '''
+        Add the inserted `hired_employees` rows to the rollup using the connection `conn`,
+        so the increment commits (or rolls back) with them.
+        '''
+        counts = Counter(
+            (row.datetime.year, (row.datetime.month - 1) // 3 + 1, row.department_id, row.job_id)
+            for row in rows
+            if row.datetime is not None and row.department_id is not None and row.job_id is not None
+            )
+        if not counts:
+            return
+        stmt = pg_insert(HiresRollup).values([
+            {'year': year, 'quarter': quarter, 'department_id': department_id, 'job_id': job_id, 'hired': hired}
+            for (year, quarter, department_id, job_id), hired in sorted(counts.items())
+            ])
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['year', 'quarter', 'department_id', 'job_id'],
+            set_={'hired': HiresRollup.hired + stmt.excluded.hired}
+            ))
+
+    @staticmethod
+    def rebuild():
+        '''Recompute the whole rollup from `hired_employees`.'''
+        hired_employees = BASE.metadata.tables['hired_employees']
+        year = extract('year', hired_employees.c.datetime)
+        quarter = extract('quarter', hired_employees.c.datetime)
+        rows = select(year, quarter, hired_employees.c.department_id, hired_employees.c.job_id, func.count()) \
+            .where(
+                hired_employees.c.datetime.is_not(None),
+                hired_employees.c.department_id.is_not(None),
+                hired_employees.c.job_id.is_not(None)
+                ) \
+            .group_by(year, quarter, hired_employees.c.department_id, hired_employees.c.job_id)
+        with ENGINE.begin() as conn:
+            conn.execute(delete(HiresRollup))
+            conn.execute(pg_insert(HiresRollup).from_select(
+                ['year', 'quarter', 'department_id', 'job_id', 'hired'], rows
+                ))
+
+    @staticmethod
+    def rebuild_if_empty():
+        '''Build the rollup when it is empty but `hired_employees` is not, e.g. on its first deployment.'''
+        hired_employees = BASE.metadata.tables['hired_employees']
+        with ENGINE.connect() as conn:
+            empty = conn.execute(select(HiresRollup.year).limit(1)).first() is None
+            has_hires = conn.execute(select(hired_employees.c.id).limit(1)).first() is not None
+        if empty and has_hires:
+            HiresRollup.rebuild()
@@ -1,11 +1,11 @@
-import csv
-from sqlalchemy import insert
 from sqlalchemy import Column, Integer, String
-from src.connectors.db_connect import ENGINE, BASE, SESSION, excecute
+from src.connectors.db_connect import ENGINE, BASE, SESSION
+from src.connectors.application_tables.bulk_loader import BulkLoader
 
 
-class Job(BASE):
+class Job(BASE, BulkLoader):
     __tablename__ = 'jobs'
+    __import_columns__ = ('id', 'job')
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     job = Column(String, unique=True)
@@ -22,53 +22,18 @@ class Job(BASE):
 
     @staticmethod
     async def insert_jobs(jobs: list):
-        result = {'valids':[], 'invalids':[]}
-        to_insert = []
-        obj = {}
-        for element in jobs:
-            if element.id:
-                obj['id'] = element.id
-            obj['job'] = element.job
-            try:
-                stmt = insert(Job).values(**obj).returning(Job)
-                query_result = excecute(stmt).fetchone()
-                to_insert.append({
-                    'id':int(query_result[0]),
-                    'job':str(query_result[1])
-                    }
-                )
-            except Exception as e:
-                result['invalids'].append(
-                    {'id':element.id, 'job':element.job}
-                )
-            print(element)
-        result['valids'] = to_insert
-        return result
+        return await Job.async_insert_models(jobs)
 
-    @staticmethod
-    async def instert_from_csv(file):
-        result = {'valids':[], 'invalids':[]}
-        f_content = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            to_insert = []
-            csvreaded = csv.reader(f_content.decode('utf-8').replace('\r\n', '\n').split('\n'))
-            for element in csvreaded:
-                try:
-                    stmt = insert(Job).values(
-                        id=int(element[0]),
-                        job=str(element[1])
-                        ).returning(Job)
-                    query_result = excecute(stmt).fetchall()
-                    if len(query_result) > 0:
-                        to_insert.append({
-                            'id':int(query_result[0][0]),
-                            'job':str(query_result[0][1])
-                            }
-                        )
-                except Exception as e:
-                    result['invalids'].append(
-                        {'id':element[0], 'job':element[1]}
-                    )
-                print(element)
-        result['valids'] = to_insert
-        return result
\ No newline at end of file
+    @classmethod
+    def parse_row(cls, element: list) -> dict:
+        return {
+            'id': int(element[0]),
+            'job': str(element[1])
+            }
+
+    @classmethod
+    def to_record(cls, row) -> dict:
+        return {
+            'id': int(row.id),
+            'job': str(row.job)
+            }
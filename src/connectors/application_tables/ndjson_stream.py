@@ -0,0 +1,42 @@
+import json
+import codecs
+from src.settings import INSERT_CHUNK_SIZE
+
+
+async def iter_ndjson_lines(chunks):
+    """
+    Yield the non-empty lines of an async iterable of byte chunks (e.g. `Request.stream()`).
+    Bytes are decoded incrementally, so only the current chunk and the pending line are held in memory.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    pending += decoder.decode(b'', final=True)
+    if pending.strip():
+        yield pending
+
+
+async def iter_ndjson_batches(chunks, structure, batch_size: int = INSERT_CHUNK_SIZE):
+    """
+    Parse and validate NDJSON lines with the pydantic `structure`, and yield `(models, invalids)`
+    every `batch_size` lines. Lines that are not valid JSON objects for `structure` are reported
+    in `invalids` with their line number and error.
+    """
+    models, invalids = [], []
+    line_number = 0
+    async for line in iter_ndjson_lines(chunks):
+        line_number += 1
+        try:
+            models.append(structure(**json.loads(line)))
+        except (ValueError, TypeError) as error:
+            invalids.append({'line': line_number, 'error': str(error)})
+        if len(models) + len(invalids) >= batch_size:
+            yield models, invalids
+            models, invalids = [], []
+    if models or invalids:
+        yield models, invalids
@@ -0,0 +1,77 @@
+import os
+import csv
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.settings import BULK_BATCH_SIZE, IMPORT_RANGE_SIZE, IMPORT_WORKERS
+
+__EXECUTOR__ = None
+__LOCK__ = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by the imports, creating it on first use.
+    Workers are spawned rather than forked: by then the process already runs the Pub/Sub (gRPC)
+    threads and holds pooled database connections, which a forked child would inherit.
+    """
+    global __EXECUTOR__
+    with __LOCK__:
+        if __EXECUTOR__ is None:
+            __EXECUTOR__ = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+                )
+        return __EXECUTOR__
+
+
+def split_ranges(path: str, range_size: int = IMPORT_RANGE_SIZE) -> list:
+    """
+    Split the file at `path` into `(start, end)` byte ranges of about `range_size` bytes.
+    Every range ends right after a line break, so no line (nor UTF-8 character) is split.
+    Quoted fields spanning several lines are not supported in this mode.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + range_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(entity, path: str, start: int, end: int) -> list:
+    """
+    Read and parse the byte range `[start, end)` of a CSV file with `entity.parse_rows`.
+    This function runs in the worker processes.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start).decode('utf-8')
+    rows = (element for element in csv.reader(content.split('\n')) if element != [])
+    return entity.parse_rows(rows)
+
+
+async def iter_parsed_batches(entity, path: str, batch_size: int = BULK_BATCH_SIZE):
+    """
+    Parse the CSV file at `path` in the process pool and yield batches of at most `batch_size`
+    `(raw row, parsed row)` pairs, in file order.
+    At most two ranges per worker are in flight, so memory stays bounded.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    pending = []
+    for start, end in split_ranges(path):
+        pending.append(loop.run_in_executor(executor, parse_range, entity, path, start, end))
+        if len(pending) >= 2 * IMPORT_WORKERS:
+            parsed = await pending.pop(0)
+            for position in range(0, len(parsed), batch_size):
+                yield parsed[position:position + batch_size]
+    for future in pending:
+        parsed = await future
+        for position in range(0, len(parsed), batch_size):
+            yield parsed[position:position + batch_size]
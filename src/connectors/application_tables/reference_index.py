@@ -0,0 +1,81 @@
+import threading
+from time import monotonic
+from sqlalchemy import select
+from src.connectors.db_connect import ENGINE
+from src.settings import REFERENCE_INDEX_TTL_SEC
+
+
+class ReferenceIndex:
+    """
+    In-memory index of the values of a referenced column (e.g. `departments.id`), used to
+    validate foreign keys before any SQL runs.
+
+    The index is loaded on first use and extended with the rows committed through the BulkLoader.
+    A missing value triggers a reload at most every `REFERENCE_INDEX_TTL_SEC` seconds, so rows
+    inserted by other instances are picked up without a round trip per rejected row.
+
+    Usage example:
+    --------------
+    ```
+        if department_id in ReferenceIndex.of(Department.__table__.c.id):
+            . . .
+    ```
+    """
+    _indexes = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, column):
+        self.column = column
+        self._values = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, column) -> 'ReferenceIndex':
+        """Return the shared index of `column`, creating it if needed."""
+        key = (column.table.name, column.name)
+        with cls._registry_lock:
+            if key not in cls._indexes:
+                cls._indexes[key] = cls(column)
+            return cls._indexes[key]
+
+    @classmethod
+    def inserted(cls, table, rows: list):
+        """Add the committed `rows` of `table` to the indexes of its columns."""
+        for (table_name, column_name), index in list(cls._indexes.items()):
+            if table_name == table.name:
+                index.add(getattr(row, column_name) for row in rows)
+
+    def refresh(self):
+        """Reload every value of the column from the database."""
+        with ENGINE.connect() as conn:
+            values = set(conn.execute(select(self.column)).scalars())
+        with self._lock:
+            self._values = values
+            self._loaded_at = monotonic()
+
+    def add(self, values):
+        with self._lock:
+            if self._values is not None:
+                self._values.update(values)
+
+    def snapshot(self) -> set:
+        """Return a copy of the current values, loading them on first use."""
+        if self._values is None:
+            self.refresh()
+        with self._lock:
+            return set(self._values)
+
+    def refresh_if_stale(self) -> bool:
+        """Reload the values if they are older than `REFERENCE_INDEX_TTL_SEC`. Returns True if reloaded."""
+        if monotonic() - self._loaded_at >= REFERENCE_INDEX_TTL_SEC:
+            self.refresh()
+            return True
+        return False
+
+    def __contains__(self, value) -> bool:
+        if self._values is None:
+            self.refresh()
+        if value in self._values:
+            return True
+        return self.refresh_if_stale() and value in self._values
@@ -0,0 +1,170 @@
+import json
+import threading
+from time import monotonic
+from functools import wraps
+from collections import OrderedDict
+from fastapi.concurrency import run_in_threadpool
+from src.settings import (
+    REPORT_CACHE_SIZE,
+    REPORT_CACHE_REDIS_URL,
+    REPORT_CACHE_TTL_SEC,
+    REPORT_CACHE_LOCAL_TTL_SEC,
+    DB_REPLICA_URLS,
+    DB_READ_YOUR_WRITES_SEC
+    )
+
+
+class ReportCache:
+    """
+    Cache of the report results, invalidated by writes.
+
+    Every commit through the BulkLoader (inserts and imports of jobs, departments and hired
+    employees) bumps a version counter, and entries are only served for the version they were
+    computed with, so a write invalidates every report at once.
+
+    There are two tiers:
+        - An in-process LRU of at most `REPORT_CACHE_SIZE` entries, expiring after
+          `REPORT_CACHE_LOCAL_TTL_SEC` seconds. Only writes on the same process invalidate it, so
+          this bounds how long the other workers and instances serve a stale report.
+        - An optional Redis tier shared by all the instances, enabled with `REPORT_CACHE_REDIS_URL`.
+          The version counter then lives in Redis too, so a write on one instance invalidates the
+          others. Its entries expire after `REPORT_CACHE_TTL_SEC` seconds.
+    If Redis is unavailable the cache falls back to the in-process tier.
+
+    When read replicas are configured, results computed in the first `DB_READ_YOUR_WRITES_SEC`
+    seconds of a version are not stored, as a lagging replica may not have the write yet.
+
+    Cached results are shared between requests and must not be mutated.
+
+    Usage example:
+    --------------
+    ```
+        @staticmethod
+        @ReportCache.cached('hired_by_quarter')
+        async def get_by_quarter(year: int = 2021):
+            . . .
+    ```
+    """
+    _entries = OrderedDict()
+    _version = 0
+    _lock = threading.Lock()
+    _shared = None
+    _shared_lock = threading.Lock()
+    _seen_version = None
+    _seen_at = 0.0
+    __version_key__ = 'report_cache:version'
+
+    @classmethod
+    def shared(cls):
+        """Return the Redis client of the shared tier, or None if it is not configured."""
+        if not REPORT_CACHE_REDIS_URL:
+            return None
+        with cls._shared_lock:
+            if cls._shared is None:
+                import redis
+                cls._shared = redis.Redis.from_url(REPORT_CACHE_REDIS_URL, socket_timeout=1)
+            return cls._shared
+
+    @classmethod
+    def version(cls) -> int:
+        """Return the current data version."""
+        shared = cls.shared()
+        if shared is not None:
+            try:
+                return int(shared.get(cls.__version_key__) or 0)
+            except Exception as e:
+                print(f'Report cache: shared tier unavailable ({e})')
+        return cls._version
+
+    @classmethod
+    def invalidate(cls):
+        """Bump the data version, invalidating every cached report."""
+        with cls._lock:
+            cls._version += 1
+            cls._entries.clear()
+            cls._seen_version, cls._seen_at = None, 0.0
+        shared = cls.shared()
+        if shared is not None:
+            try:
+                shared.incr(cls.__version_key__)
+            except Exception as e:
+                print(f'Report cache: shared tier unavailable ({e})')
+
+    @classmethod
+    def settled(cls, version: int) -> bool:
+        """Whether the replicas have had time to replay the write that produced `version`."""
+        if not DB_REPLICA_URLS:
+            return True
+        with cls._lock:
+            if version != cls._seen_version:
+                cls._seen_version, cls._seen_at = version, monotonic()
+            return monotonic() - cls._seen_at >= DB_READ_YOUR_WRITES_SEC
+
+    @classmethod
+    def get(cls, key: str, version: int):
+        """Return the result cached for `key` at `version`, or None."""
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry[0] == version and entry[2] > monotonic():
+                cls._entries.move_to_end(key)
+                return entry[1]
+        shared = cls.shared()
+        if shared is not None:
+            try:
+                value = shared.get(f'report_cache:{version}:{key}')
+            except Exception as e:
+                print(f'Report cache: shared tier unavailable ({e})')
+                return None
+            if value is not None:
+                result = json.loads(value)
+                cls._store(key, version, result)
+                return result
+        return None
+
+    @classmethod
+    def set(cls, key: str, version: int, result):
+        """Cache `result` for `key`, computed at `version`."""
+        cls._store(key, version, result)
+        shared = cls.shared()
+        if shared is not None:
+            try:
+                shared.set(f'report_cache:{version}:{key}', json.dumps(result), ex=REPORT_CACHE_TTL_SEC)
+            except Exception as e:
+                print(f'Report cache: shared tier unavailable ({e})')
+
+    @classmethod
+    def _store(cls, key: str, version: int, result):
+        with cls._lock:
+            cls._entries[key] = (version, result, monotonic() + REPORT_CACHE_LOCAL_TTL_SEC)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > REPORT_CACHE_SIZE:
+                cls._entries.popitem(last=False)
+
+    @staticmethod
+    async def _call(function, *args):
+        """Call `function`, in the threadpool when the Redis tier is configured, as its client blocks."""
+        if REPORT_CACHE_REDIS_URL:
+            return await run_in_threadpool(function, *args)
+        return function(*args)
+
+    @classmethod
+    def cached(cls, name: str):
+        """
+        Decorate an async report function to cache its results by `name` and arguments.
+        The version is read before computing, so a result racing with a write is stored
+        under the old version and never served after it.
+        With the Redis tier, the cache is read and written in the threadpool, off the event loop.
+        """
+        def decorator(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                key = f'{name}:{json.dumps([args, kwargs], sort_keys=True, default=str)}'
+                version = await cls._call(cls.version)
+                result = await cls._call(cls.get, key, version)
+                if result is None:
+                    result = await function(*args, **kwargs)
+                    if cls.settled(version):
+                        await cls._call(cls.set, key, version, result)
+                return result
+            return wrapper
+        return decorator
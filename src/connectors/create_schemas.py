@@ -1,6 +1,7 @@
 from src.connectors.application_tables.jobs import Job
 from src.connectors.application_tables.departments import Department
 from src.connectors.application_tables.hired_employees import HiredEmployees
+from src.connectors.application_tables.hires_rollup import HiresRollup
 from src.connectors.long_process.async_process import AsyncProcess
 
 ALLOWED_ENTITIES = {
@@ -14,4 +15,6 @@ def create_all_schemas():
 	Job.__create_all_schemas__()
 	HiredEmployees.__create_all_schemas__()
 	Department.__create_all_schemas__()
-	AsyncProcess.__create_all_schemas__()
\ No newline at end of file
+	HiresRollup.__create_all_schemas__()
+	AsyncProcess.__create_all_schemas__()
+	HiresRollup.rebuild_if_empty()
\ No newline at end of file
@@ -1,39 +1,169 @@
-from sqlalchemy import create_engine
+import threading
+from time import time
+from contextvars import ContextVar
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base
 
+from src.connectors.pool_stats import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 from src.settings import (
     POSTGRES_DB,
     POSTGRES_USER,
     POSTGRES_PASSWORD,
     POSTGRES_HOST,
-    DB_PORT
+    DB_PORT,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_ASYNC_POOL_PERCENT,
+    DB_POOL_TIMEOUT_SEC,
+    DB_POOL_RECYCLE_SEC,
+    DB_POOL_PRE_PING,
+    DB_REPLICA_URLS,
+    DB_READ_YOUR_WRITES_SEC
     )
 
 # Configura la cadena de conexión (reemplaza los valores con los tuyos)
 DATABASE_URL = f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{DB_PORT}/{POSTGRES_DB}'
+ASYNC_DATABASE_URL = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{DB_PORT}/{POSTGRES_DB}'
+
+def _split(total: int, percent: int) -> tuple:
+    """Split `total` connections into the `(sync, asyncio)` shares, the asyncio one getting `percent`."""
+    share = total * percent // 100
+    return total - share, share
+
+# Configuración de los pools de conexiones: los motores sync y asyncio se reparten
+# DB_POOL_SIZE y DB_MAX_OVERFLOW, así un worker no abre más conexiones que las configuradas.
+_SIZES, _OVERFLOWS = _split(DB_POOL_SIZE, DB_ASYNC_POOL_PERCENT), _split(DB_MAX_OVERFLOW, DB_ASYNC_POOL_PERCENT)
+POOL_OPTIONS = {
+    'pool_timeout': DB_POOL_TIMEOUT_SEC,
+    'pool_recycle': DB_POOL_RECYCLE_SEC,
+    'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+# Cada motor conserva al menos una conexión.
+SYNC_POOL_OPTIONS = {**POOL_OPTIONS, 'pool_size': max(_SIZES[0], 1), 'max_overflow': _OVERFLOWS[0]}
+ASYNC_POOL_OPTIONS = {**POOL_OPTIONS, 'pool_size': max(_SIZES[1], 1), 'max_overflow': _OVERFLOWS[1]}
 
 # Crea una instancia del motor SQLAlchemy
-ENGINE = create_engine(DATABASE_URL)
+ENGINE = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **SYNC_POOL_OPTIONS)
 
-# Crea una sesión
+# Fábrica de sesiones compartida
 SESSION = sessionmaker(bind=ENGINE)
-session = SESSION()
 BASE = declarative_base()
 
+# Motor y sesión asyncio (asyncpg), para usar desde el event loop sin bloquearlo.
+# Sus conexiones pertenecen al event loop de la aplicación: no usarlos desde otros loops (p. ej. asyncio.run).
+ASYNC_ENGINE = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **ASYNC_POOL_OPTIONS)
+ASYNC_SESSION = async_sessionmaker(bind=ASYNC_ENGINE, expire_on_commit=False)
+
+# Réplicas de lectura (opcionales): los reportes y listados se envían a ellas, las escrituras al primario.
+REPLICA_ENGINES = [
+    create_engine(url, poolclass=InstrumentedQueuePool, **SYNC_POOL_OPTIONS)
+    for url in DB_REPLICA_URLS
+    ]
+ASYNC_REPLICA_ENGINES = [
+    create_async_engine(url.replace('postgresql://', 'postgresql+asyncpg://', 1), poolclass=InstrumentedAsyncQueuePool, **ASYNC_POOL_OPTIONS)
+    for url in DB_REPLICA_URLS
+    ]
+__REPLICA_TURN__ = [0]
+__REPLICA_LOCK__ = threading.Lock()
+
+
+class ReadPin:
+    """
+    Read-your-writes pinning of a request (or task): after a write, its reads go to the primary
+    until `until` (unix time), so they never see a replica that has not replayed the write yet.
+    """
+    def __init__(self, until: float = 0.0):
+        self.until = until
+        self.wrote = False
+
+READ_PIN = ContextVar('READ_PIN', default=None)
+
+def mark_write():
+    """Pin the reads of the current context to the primary for `DB_READ_YOUR_WRITES_SEC` seconds."""
+    pin = READ_PIN.get()
+    if pin is None:
+        pin = ReadPin()
+        READ_PIN.set(pin)
+    pin.until = time() + DB_READ_YOUR_WRITES_SEC
+    pin.wrote = True
+
+def _replica_index():
+    """Index of the next replica (round robin), or None to read from the primary."""
+    pin = READ_PIN.get()
+    if not DB_REPLICA_URLS or (pin is not None and time() < pin.until):
+        return None
+    with __REPLICA_LOCK__:
+        __REPLICA_TURN__[0] = (__REPLICA_TURN__[0] + 1) % len(DB_REPLICA_URLS)
+        return __REPLICA_TURN__[0]
+
+def read_engine():
+    """Engine for read-only queries: a replica when configured and the context is not pinned."""
+    index = _replica_index()
+    return ENGINE if index is None else REPLICA_ENGINES[index]
+
+def async_read_session():
+    """Asyncio session for read-only queries: on a replica when configured and the context is not pinned."""
+    index = _replica_index()
+    return ASYNC_SESSION() if index is None else ASYNC_SESSION(bind=ASYNC_REPLICA_ENGINES[index])
+
 def excecute(stmt,engine=ENGINE):
     with engine.connect() as conn:
         result = conn.execute(stmt)
         conn.commit()
         return result
 
+async def async_excecute(stmt, engine=ASYNC_ENGINE):
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt)
+        await conn.commit()
+        return result
+
+# Índices de tablas existentes:
+def create_missing_indexes(table, engine=ENGINE):
+    """
+    Create the indexes of `table` missing on the database with `CREATE INDEX CONCURRENTLY`, so an
+    existing table keeps accepting writes while they are built. Each statement runs in autocommit,
+    as PostgreSQL does not build indexes concurrently inside a transaction.
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for index in table.indexes:
+            valid = conn.execute(
+                text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'), {'name': index.name}
+                ).scalar()
+            if valid:
+                continue
+            if valid is False:
+                # Una construcción concurrente interrumpida deja el índice inválido: se reconstruye.
+                conn.execute(text(f'DROP INDEX CONCURRENTLY {index.name}'))
+            options = index.dialect_options['postgresql']
+            options['concurrently'] = True
+            try:
+                index.create(conn)
+            finally:
+                options['concurrently'] = False
+
 # Test database health:
-def db_health():
+def db_health() -> bool:
     try:
-        ENGINE = create_engine(DATABASE_URL)
-        connection = ENGINE.connect()
-        print("Database connection successful")
-        connection.close()
+        with ENGINE.connect():
+            return True
     except OperationalError as e:
         print("Error to connect database:", e)
+        return False
+
+# Pool diagnostics:
+def pool_status() -> dict:
+    return {
+        'sync': ENGINE.pool.stats.to_dict(ENGINE.pool),
+        'async': ASYNC_ENGINE.sync_engine.pool.stats.to_dict(ASYNC_ENGINE.sync_engine.pool),
+        'replicas': [
+            {
+                'sync': engine.pool.stats.to_dict(engine.pool),
+                'async': async_engine.sync_engine.pool.stats.to_dict(async_engine.sync_engine.pool),
+            }
+            for engine, async_engine in zip(REPLICA_ENGINES, ASYNC_REPLICA_ENGINES)
+            ],
+        }
@@ -1,13 +1,70 @@
 import json
+import zlib
 import uuid
-import asyncio
 import base64
 from typing import Optional
-from src.connectors.db_connect import BASE
+from src.connectors.db_connect import BASE, ENGINE, mark_write
 from datetime import datetime, timedelta, timezone
 from src.connectors.long_process.base import BaseCRUD
-from src.settings import JOB_MAX_ATTEMPTS, JOB_TIMEOUT_SEC
-from sqlalchemy import JSON, BigInteger, Column, DateTime, LargeBinary, String, and_, select, text
+from src.connectors.long_process.partitions import MonthlyPartitions, add_months
+from src.settings import (
+    JOB_MAX_ATTEMPTS,
+    JOB_TIMEOUT_SEC,
+    ASYNC_PROCESS_RETENTION_DAYS,
+    ASYNC_PROCESS_RETENTION_MODE,
+    ASYNC_PROCESS_ARCHIVE_DAYS,
+    ASYNC_PROCESS_PARTITIONS_AHEAD,
+    BULK_BATCH_SIZE
+    )
+from sqlalchemy import (
+    JSON, BigInteger, Column, DateTime, Index, LargeBinary, String, and_, delete, func, insert, select, text, update
+    )
+
+RETENTION_MODES = ('archive', 'drop')
+
+# Channel notified with the id of every job that becomes successful, see `EventHub`.
+EVENTS_CHANNEL = 'mge_async_process_events'
+# Sequence numbering the jobs as they become successful, sent as the id of their server-sent event.
+EVENTS_SEQUENCE = 'mge_async_process_event_seq'
+
+
+class AsyncProcessArchive(BASE):
+    """
+    Notified and failed jobs moved out of `mge_async_process` by `AsyncProcess.apply_retention`.
+    Their `input`, `output` and `job_metadata` JSON are stored zlib-compressed in `payload`
+    (see `pack` and `unpack`). The table is partitioned by month like `mge_async_process`, and
+    its partitions older than `ASYNC_PROCESS_ARCHIVE_DAYS` are dropped.
+    """
+    __tablename__ = 'mge_async_process_archive'
+    __payload_columns__ = ('input', 'output', 'job_metadata')
+
+    id = Column(LargeBinary(500), primary_key=True, nullable=False)
+    event_type = Column(String(500), nullable=False)
+    status = Column(String(500), nullable=False)
+    attempts = Column(BigInteger)
+    created_by = Column(String(500))
+    created_timestamp_utc = Column(DateTime, primary_key=True, nullable=False)
+    updated_by = Column(String(500))
+    updated_timestamp_utc = Column(DateTime, nullable=False)
+    event_seq = Column(BigInteger)
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_timestamp_utc)'}
+    __partitions__ = MonthlyPartitions(__tablename__, 'created_timestamp_utc')
+
+    @classmethod
+    def pack(cls, job: dict) -> dict:
+        """Archive row of a `mge_async_process` row, given as a dict."""
+        values = {key: value for key, value in job.items() if key not in cls.__payload_columns__}
+        payload = {key: job[key] for key in cls.__payload_columns__}
+        values['payload'] = zlib.compress(json.dumps(payload, default=str).encode())
+        return values
+
+    @staticmethod
+    def unpack(payload: bytes) -> dict:
+        """The `input`, `output` and `job_metadata` of an archived job."""
+        return json.loads(zlib.decompress(payload))
+
 
 class AsyncProcess(BASE, BaseCRUD):
     __tablename__ = 'mge_async_process'
@@ -16,6 +73,8 @@ class AsyncProcess(BASE, BaseCRUD):
     __notified__ = 'notified'
     __pending__ = 'pending'
     __in_progress__ = 'in_progress'
+    __message__ = 'message'
+    __csv_import__ = 'csv_import'
     __JOB_MAX_ATTEMPTS__ = JOB_MAX_ATTEMPTS
     __JOB_TIMEOUT__ = JOB_TIMEOUT_SEC
 
@@ -27,9 +86,25 @@ class AsyncProcess(BASE, BaseCRUD):
     job_metadata = Column(JSON)
     attempts = Column(BigInteger)
     created_by = Column(String(500))
-    created_timestamp_utc = Column(DateTime, nullable=False)
+    created_timestamp_utc = Column(DateTime, primary_key=True, nullable=False)
     updated_by = Column(String(500))
     updated_timestamp_utc = Column(DateTime, nullable=False)
+    # Set from `EVENTS_SEQUENCE` when the job is sent to the SSE clients, see `async_number_events`.
+    event_seq = Column(BigInteger)
+
+    # Seek index for paging through the jobs by creation time.
+    # The table is partitioned by month (see `apply_retention`), so scans bounded by time only read
+    # the recent partitions. PostgreSQL requires the partition key in the primary key, but the jobs
+    # are still identified by `id` alone: the database no longer enforces its uniqueness, which relies
+    # on the random UUIDs generated by `insert_message` and `async_insert_message`.
+    # The events of a user are replayed from their last event id through the second index.
+    __table_args__ = (
+        Index('ix_mge_async_process_created_timestamp_utc_id', 'created_timestamp_utc', 'id'),
+        Index('ix_mge_async_process_created_by_event_seq', 'created_by', 'event_seq'),
+        {'postgresql_partition_by': 'RANGE (created_timestamp_utc)'},
+        )
+    __mapper_args__ = {'primary_key': ['id']}
+    __partitions__ = MonthlyPartitions(__tablename__, 'created_timestamp_utc')
 
 
     @classmethod
@@ -101,33 +176,216 @@ class AsyncProcess(BASE, BaseCRUD):
         return new_record.to_dict()
 
     @classmethod
-    @BaseCRUD.with_session
-    async def event_stream(cls, **kwargs):
+    async def async_insert_message(cls, event_type, status, input, attempts, created_by, updated_by) -> dict:
+        """
+        Async version of `insert_message`, for the code running on the event loop.
+        Returns the newly inserted record as a dictionary. As in `insert_message`, a failed insert
+        (e.g. an IntegrityError) is rolled back and raised.
+        """
+        now = datetime.utcnow()
+        new_record = AsyncProcess(
+            id=base64.b64encode(str(uuid.uuid4()).encode()),
+            event_type=event_type,
+            status=status,
+            input=input,
+            attempts=attempts,
+            created_by=created_by,
+            updated_by=updated_by,
+            created_timestamp_utc=now,
+            updated_timestamp_utc=now,
+        )
+        async with cls.async_get_session() as session:
+            session.add(new_record)
+            await session.commit()
+        mark_write()
+        return new_record.to_dict()
+
+    @classmethod
+    def event_stream(cls, user: Optional[str] = None, last_event_id: Optional[int] = None):
         """
         Event stream for the results of long-running processes.
 
-        This generator yields new events as they are available. If no new events are available, it sends a heartbeat message.
+        This generator yields the jobs that become 'successful' as they complete, fanned out by the
+        in-process `EventHub`, so the database load does not depend on the number of clients.
+        If no new events are available, it sends a heartbeat message.
 
-        The event stream is filtered by process status: only processes with a status of 'successful' are considered.
+        :param user: Only stream the jobs created by this user; all of them if None.
+        :type user: str
+        :param last_event_id: Id of the last event received before reconnecting; the later ones are replayed first.
+        :type last_event_id: int
+        :return: An async generator of messages.
+        """
+        from src.connectors.long_process.event_hub import EVENT_HUB
+        return EVENT_HUB.stream(user, last_event_id)
 
-        The stream will be closed after the first iteration.
+    @classmethod
+    def event(cls, record: dict) -> str:
+        """Server-sent event of a successful job, given its `id`, `created_by`, `output` and `event_seq`."""
+        response = {
+            'id': record['id'].decode(),
+            'user': record['created_by'],
+            'response': (record['output'] or {}).get('response'),
+        }
+        return f"id: {record['event_seq']}\ndata: {json.dumps(response)}\n\n"
 
-        :param kwargs: Additional keyword arguments passed to the BaseCRUD.with_session decorator.
-        :return: An async generator of messages.
+    @classmethod
+    async def async_number_events(cls, ids: list) -> list:
+        """
+        Mark the successful messages in `ids` as 'notified' and number their events from `EVENTS_SEQUENCE`.
+
+        The numbers are taken in a transaction serialized by an advisory lock across the instances, so
+        they become visible in increasing order: a client that got the event `n` can replay the ones
+        after `n` without missing any committed later with a lower number.
+        Returns the `id`, `created_by`, `output` and `event_seq` of every message in `ids` numbered, by
+        this call or a previous one, in `event_seq` order.
+        """
+        table = cls.__table__
+        async with cls.async_get_session() as session:
+            await session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:name))'), {'name': EVENTS_SEQUENCE})
+            await session.execute(
+                update(table)
+                .where(table.c.id.in_(ids), table.c.status == cls.__successful__)
+                .values(status=cls.__notified__, event_seq=func.nextval(EVENTS_SEQUENCE))
+                )
+            records = (await session.execute(
+                select(table.c.id, table.c.created_by, table.c.output, table.c.event_seq)
+                .where(table.c.id.in_(ids), table.c.event_seq.is_not(None))
+                .order_by(table.c.event_seq)
+                )).mappings().all()
+            await session.commit()
+        mark_write()
+        return records
+
+    @classmethod
+    def apply_retention(cls, days: int = ASYNC_PROCESS_RETENTION_DAYS, mode: str = ASYNC_PROCESS_RETENTION_MODE) -> dict:
+        """
+        Retention policy of the jobs, run periodically by the service.
+
+        The finished jobs (successful, notified or failed) created more than `days` days ago are moved,
+        compressed, to `mge_async_process_archive` (`mode='archive'`) or deleted (`mode='drop'`), and the
+        monthly partitions left empty are dropped, so the hot table only holds the recent and unfinished jobs.
+        That includes the messages never delivered to an SSE client, which `EventHub` stops reading then.
+        Jobs are archived in batches of `BULK_BATCH_SIZE`, one transaction each. With `archive`, the archive
+        partitions older than `ASYNC_PROCESS_ARCHIVE_DAYS` days are dropped too.
+        The partitions of the next `ASYNC_PROCESS_PARTITIONS_AHEAD` months are created beforehand.
+        Every worker and instance runs it, but an advisory lock lets only one of them at a time do so;
+        the others skip their turn.
+
+        :return: The number of archived or deleted jobs, and the dropped partitions.
+        :rtype: dict
+        """
+        if mode not in RETENTION_MODES:
+            raise ValueError(f"Retention mode '{mode}' not supported, use one of {RETENTION_MODES}")
+        lock = {'name': f'{cls.__tablename__}_retention'}
+        with ENGINE.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            if not conn.execute(text('SELECT pg_try_advisory_lock(hashtext(:name))'), lock).scalar():
+                return {'mode': mode, 'jobs': 0, 'dropped_partitions': [], 'skipped': True}
+            try:
+                return cls._apply_retention(days, mode)
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(hashtext(:name))'), lock)
+
+    @classmethod
+    def _apply_retention(cls, days: int, mode: str) -> dict:
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=days)
+        table, archive = cls.__table__, AsyncProcessArchive.__table__
+        # Finished imports stay 'successful', and so do the messages no SSE client received in time.
+        finished = table.c.status.in_([cls.__successful__, cls.__notified__, cls.__failed__])
+        expired = and_(table.c.created_timestamp_utc < cutoff, finished)
+        dropped = []
+
+        with ENGINE.begin() as conn:
+            cls.__partitions__.ensure(conn, now, add_months(now, ASYNC_PROCESS_PARTITIONS_AHEAD))
+        if mode == 'archive':
+            jobs = 0
+            while True:
+                with ENGINE.begin() as conn:
+                    rows = conn.execute(select(table).where(expired).limit(BULK_BATCH_SIZE)).mappings().all()
+                    if not rows:
+                        break
+                    created = [row['created_timestamp_utc'] for row in rows]
+                    AsyncProcessArchive.__partitions__.ensure(conn, min(created), max(created))
+                    conn.execute(insert(archive), [AsyncProcessArchive.pack(dict(row)) for row in rows])
+                    conn.execute(delete(table).where(
+                        table.c.created_timestamp_utc < cutoff, table.c.id.in_([row['id'] for row in rows])
+                        ))
+                    jobs += len(rows)
+            with ENGINE.begin() as conn:
+                dropped += AsyncProcessArchive.__partitions__.drop_before(
+                    conn, now - timedelta(days=ASYNC_PROCESS_ARCHIVE_DAYS), only_empty=False
+                    )
+        else:
+            with ENGINE.begin() as conn:
+                jobs = conn.execute(delete(table).where(expired)).rowcount
+        with ENGINE.begin() as conn:
+            dropped += cls.__partitions__.drop_before(conn, cutoff)
+        return {'mode': mode, 'jobs': jobs, 'dropped_partitions': dropped}
+
+    @classmethod
+    def __create_all_schemas__(cls):
+        """
+        Create the partitioned tables and the partitions of the current and next months.
+        A table created unpartitioned by a previous version is migrated: its rows are copied into the
+        partitioned table, in the partitions of their months, and the old table is dropped.
+        Everything runs in a single transaction, so an interrupted migration leaves the old table
+        in place; one interrupted by a previous version (renamed table left behind) is resumed.
+        """
+        legacy = f'{cls.__tablename__}_unpartitioned'
+        now = datetime.utcnow()
+        with ENGINE.begin() as conn:
+            kind = conn.execute(
+                text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)'), {'name': cls.__tablename__}
+                ).scalar()
+            if kind == 'r':
+                conn.execute(text(f'ALTER TABLE {cls.__tablename__} RENAME TO {legacy}'))
+                conn.execute(text(f'ALTER TABLE {legacy} RENAME CONSTRAINT {cls.__tablename__}_pkey TO {legacy}_pkey'))
+                for index in cls.__table__.indexes:
+                    conn.execute(text(f'ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_unpartitioned'))
+            migrate = conn.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': legacy}).scalar()
+            cls.__add_event_seq__(conn)
+            BASE.metadata.create_all(conn)
+            # PostgreSQL cannot build the indexes of a partitioned table concurrently.
+            for index in cls.__table__.indexes:
+                index.create(conn, checkfirst=True)
+
+            start = now
+            if migrate:
+                start = conn.execute(text(f'SELECT min(created_timestamp_utc) FROM {legacy}')).scalar() or now
+            cls.__partitions__.ensure(conn, start, add_months(now, ASYNC_PROCESS_PARTITIONS_AHEAD))
+            AsyncProcessArchive.__partitions__.ensure(conn, now, now)
+            cls.__create_notify_trigger__(conn)
+            if migrate:
+                names = ', '.join(column.name for column in cls.__table__.columns if column.name != 'event_seq')
+                conn.execute(text(f'INSERT INTO {cls.__tablename__} ({names}) SELECT {names} FROM {legacy}'))
+                conn.execute(text(f'DROP TABLE {legacy}'))
+
+    @classmethod
+    def __add_event_seq__(cls, conn):
+        """Create `EVENTS_SEQUENCE`, and the `event_seq` column missing on the tables created by a previous version."""
+        conn.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {EVENTS_SEQUENCE}'))
+        for table in (cls.__tablename__, AsyncProcessArchive.__tablename__):
+            conn.execute(text(f'ALTER TABLE IF EXISTS {table} ADD COLUMN IF NOT EXISTS event_seq BIGINT'))
+
+    @classmethod
+    def __create_notify_trigger__(cls, conn):
+        """
+        Trigger notifying `EVENTS_CHANNEL` with the id of every message inserted as, or updated to, 'successful',
+        whoever writes it. The notifications are delivered when the transaction commits.
         """
-        while True:
-            records = cls.custom_filter(where_dict={'status': cls.__successful__}, columns=['id', 'created_by', 'output'])
-            if records:
-                for record in records:
-                    response = {
-                        'id': record['id'].decode(),
-                        'user': record['created_by'],
-                        'response': record['output']['response'],
-                    }
-                    yield f'data: {json.dumps(response)}\n\n'
-                    cls.update_by_filter(
-                        filter_criteria={'id': record['id']},
-                        update_values={'status': cls.__notified__}
-                        )
-            yield ": heartbeat\n\n"
-            await asyncio.sleep(3)
+        conn.execute(text(f'''
+            CREATE OR REPLACE FUNCTION {cls.__tablename__}_notify() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.event_type = '{cls.__message__}' AND NEW.status = '{cls.__successful__}'
+                        AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status) THEN
+                    PERFORM pg_notify('{EVENTS_CHANNEL}', encode(NEW.id, 'escape'));
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            '''))
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {cls.__tablename__}_notify ON {cls.__tablename__}'))
+        conn.execute(text(
+            f'CREATE TRIGGER {cls.__tablename__}_notify AFTER INSERT OR UPDATE OF status ON {cls.__tablename__} '
+            f'FOR EACH ROW EXECUTE FUNCTION {cls.__tablename__}_notify()'
+            ))
@@ -1,8 +1,50 @@
 # Import necessary modules and packages
+import json
+import base64
+from datetime import datetime
 from functools import wraps
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, cast, column, delete, select, tuple_, update, values
 from sqlalchemy.exc import IntegrityError
-from src.connectors.db_connect import BASE, ENGINE
+from src.connectors.db_connect import BASE, ENGINE, SESSION, ASYNC_ENGINE, ASYNC_SESSION, async_read_session, create_missing_indexes, mark_write, read_engine
+from src.connectors.statement_cache import STATEMENT_CACHE, where_clauses, where_key, where_params
+
+# Bind parameters accepted by PostgreSQL in a single statement.
+MAX_BIND_PARAMETERS = 32767
+
+def _chunks(items: list, size: int) -> list:
+    """Split `items` into lists of at most `size` items."""
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def encode_cursor(values: list) -> str:
+    """Encode the ordering values of the last row of a page as an opaque, URL-safe cursor token."""
+    tagged = []
+    for value in values:
+        if isinstance(value, bytes):
+            tagged.append({'bytes': base64.b64encode(value).decode()})
+        elif isinstance(value, datetime):
+            tagged.append({'datetime': value.isoformat()})
+        else:
+            tagged.append(value)
+    return base64.urlsafe_b64encode(json.dumps(tagged).encode()).decode()
+
+
+def decode_cursor(token: str) -> list:
+    """Decode a cursor token produced by `encode_cursor`."""
+    try:
+        tagged = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{token}'")
+    values = []
+    for value in tagged:
+        if isinstance(value, dict) and 'bytes' in value:
+            values.append(base64.b64decode(value['bytes']))
+        elif isinstance(value, dict) and 'datetime' in value:
+            values.append(datetime.fromisoformat(value['datetime']))
+        else:
+            values.append(value)
+    return values
+
 
 # Define a class for basic CRUD operations
 class BaseCRUD:
@@ -13,13 +55,18 @@ class BaseCRUD:
     Then, these methods can be used along with built-in SQLAlchemy methods.
     A session is created and closed at the end of each method call.
     If exceptions occur, the session is rolled back.
+    The statements of `custom_filter`, `check_existence`, `update_by_filter` and `delete_by_filter`
+    are parameterized and cached by shape in `STATEMENT_CACHE` (see `statement_cache_stats`).
     """
 
     @staticmethod
-    def get_session():
-        """Create a session to interact with the database."""
-        Session = sessionmaker(bind=ENGINE)
-        return Session()
+    def get_session(replica=False):
+        """
+        Create a session to interact with the database.
+        With `replica`, the session reads from a replica when they are configured and the current
+        context has not written recently (read-your-writes), for read-only queries that tolerate lag.
+        """
+        return SESSION(bind=read_engine()) if replica else SESSION()
 
     @classmethod
     def insert_one(cls, **kwargs):
@@ -32,6 +79,7 @@ class BaseCRUD:
             instance = cls(**kwargs)
             session.add(instance)
             session.commit()
+            mark_write()
             return instance
         except IntegrityError as e:
             print(e)
@@ -51,6 +99,7 @@ class BaseCRUD:
             instances = [cls(**item) for item in data]
             session.add_all(instances)
             session.commit()
+            mark_write()
             return instances
         except IntegrityError:
             session.rollback()
@@ -59,41 +108,161 @@ class BaseCRUD:
             session.close()
 
     @classmethod
-    def custom_filter(cls, where_dict=None, columns=None, limit=None, offset=None) -> list[dict]:
+    def custom_filter(cls, where_dict=None, columns=None, limit=None, offset=None, replica=False) -> list[dict]:
         """
         Perform a custom filter operation with specified conditions, columns, limit, and offset.
+        With `replica`, read from a replica (see `get_session`).
         Example usage: User.custom_filter(where_dict={"id": 2}, columns=["name", "age"], limit=3, offset=1)
         """
-        session = cls.get_session()
+        stmt, params = cls._filter_statement(where_dict, columns, limit, offset)
+        session = cls.get_session(replica)
         try:
-            query = session.query(cls)
-            if where_dict:
-                query = query.filter_by(**where_dict)
-            if columns:
-                columns_to_select = [getattr(cls, col) for col in columns]
-                query = query.with_entities(*columns_to_select)
+            results = session.execute(stmt, params).all()
+        finally:
+            session.close()
+        names = columns or [column.name for column in cls.__table__.columns]
+        return [dict(zip(names, result)) for result in results]
+
+    @classmethod
+    def _filter_statement(cls, where_dict=None, columns=None, limit=None, offset=None) -> tuple:
+        """Cached statement of `custom_filter` and its parameters."""
+        where_dict = where_dict or {}
+        names = tuple(columns or [column.name for column in cls.__table__.columns])
+
+        def build():
+            stmt = select(*[getattr(cls, name) for name in names]).where(*where_clauses(cls, where_dict))
             if limit:
-                query = query.limit(limit)
+                stmt = stmt.limit(bindparam('limit'))
             if offset:
-                query = query.offset(offset)
-            results = query.all()
-            if columns:
-                data = [dict(zip(columns, result)) for result in results]
-            else:
-                data = [
-                    {column.name: getattr(result, column.name) for column in cls.__table__.columns}
-                    for result in results
-                ]
-
-            return data
+                stmt = stmt.offset(bindparam('offset'))
+            return stmt
+
+        key = (cls, 'select', where_key(where_dict), names, bool(limit), bool(offset))
+        params = where_params(where_dict)
+        if limit:
+            params['limit'] = limit
+        if offset:
+            params['offset'] = offset
+        return STATEMENT_CACHE.get(key, build), params
+
+    @classmethod
+    def _exists_statement(cls, criteria: dict) -> tuple:
+        """Cached statement of `check_existence` and its parameters."""
+        primary_key = list(cls.__mapper__.primary_key)
+        stmt = STATEMENT_CACHE.get(
+            (cls, 'exists', where_key(criteria)),
+            lambda: select(*primary_key).where(*where_clauses(cls, criteria)).limit(1)
+            )
+        return stmt, where_params(criteria)
+
+    @classmethod
+    def _update_statement(cls, filter_criteria: dict, update_values: dict) -> tuple:
+        """Cached statement of `update_by_filter` and its parameters, set as `v_<column>`."""
+        def build():
+            values = {
+                getattr(cls, key): bindparam(f'v_{key}', type_=getattr(cls, key).type)
+                for key in sorted(update_values)
+                }
+            return update(cls).where(*where_clauses(cls, filter_criteria)).values(values) \
+                .execution_options(synchronize_session=False)
+
+        stmt = STATEMENT_CACHE.get((cls, 'update', where_key(filter_criteria), tuple(sorted(update_values))), build)
+        params = where_params(filter_criteria)
+        params.update({f'v_{key}': value for key, value in update_values.items()})
+        return stmt, params
+
+    @classmethod
+    def _delete_statement(cls, filter_criteria: dict) -> tuple:
+        """Cached statement of `delete_by_filter` and its parameters."""
+        stmt = STATEMENT_CACHE.get(
+            (cls, 'delete', where_key(filter_criteria)),
+            lambda: delete(cls).where(*where_clauses(cls, filter_criteria)).execution_options(synchronize_session=False)
+            )
+        return stmt, where_params(filter_criteria)
+
+    @staticmethod
+    def statement_cache_stats() -> dict:
+        """
+        Hit rate of the cached statements, together with the number of compiled statements
+        held by the compiled cache of each engine.
+        """
+        stats = STATEMENT_CACHE.to_dict()
+        stats['compiled'] = {
+            'sync': len(ENGINE._compiled_cache or ()),
+            'async': len(ASYNC_ENGINE.sync_engine._compiled_cache or ()),
+            }
+        return stats
+
+    @classmethod
+    def paginate(cls, where_dict=None, columns=None, order_by=None, limit=100, cursor=None, descending=False, replica=False) -> dict:
+        """
+        Keyset (seek) pagination: return the page of rows that follows `cursor`, ordered by
+        the `order_by` column and then by the primary key, which breaks ties.
+        Each page is a range scan from the last row of the previous one, so its cost does not
+        grow with the depth of the page as with `offset`. The ordering column should be indexed.
+        The returned `next_cursor` is None after the last page. With `replica`, read from a replica.
+        Example usage:
+            page = User.paginate(where_dict={"age": 30}, columns=["name"], order_by="created_at", limit=50)
+            page = User.paginate(where_dict={"age": 30}, columns=["name"], order_by="created_at", limit=50, cursor=page["next_cursor"])
+        """
+        stmt, columns = cls._page_statement(where_dict, columns, order_by, limit, cursor, descending)
+        session = cls.get_session(replica)
+        try:
+            results = session.execute(stmt).all()
         finally:
             session.close()
+        return cls._page(results, columns, limit)
 
+    @classmethod
+    def _page_statement(cls, where_dict, columns, order_by, limit, cursor, descending) -> tuple:
+        """Statement of `paginate`: the selected `columns` followed by the ordering keys."""
+        primary_key = list(cls.__mapper__.primary_key)
+        if order_by is not None and order_by not in cls.__table__.columns:
+            raise ValueError(f"Column '{order_by}' not found in '{cls.__tablename__}'")
+        keys = ([cls.__table__.columns[order_by]] if order_by is not None else []) \
+            + [column for column in primary_key if column.name != order_by]
+        columns = columns or [column.name for column in cls.__table__.columns]
+
+        stmt = select(*[getattr(cls, column) for column in columns], *keys)
+        if where_dict:
+            stmt = stmt.filter_by(**where_dict)
+        if cursor:
+            last = decode_cursor(cursor)
+            if len(last) != len(keys):
+                raise ValueError(f"Invalid cursor '{cursor}'")
+            stmt = stmt.where(tuple_(*keys) < tuple_(*last) if descending else tuple_(*keys) > tuple_(*last))
+        stmt = stmt.order_by(*[key.desc() if descending else key.asc() for key in keys]).limit(limit)
+        return stmt, columns
+
+    @staticmethod
+    def _page(results: list, columns: list, limit: int) -> dict:
+        data = [dict(zip(columns, result)) for result in results]
+        next_cursor = encode_cursor(list(results[-1][len(columns):])) if len(results) == limit else None
+        return {'items': data, 'next_cursor': next_cursor}
+
+    @classmethod
+    def iter_batches(cls, where_dict=None, columns=None, order_by=None, batch_size=1000, descending=False, replica=False):
+        """
+        Generator over the rows of the table in lists of at most `batch_size` dicts, fetched
+        page by page with `paginate`, so large tables are read at a constant cost per batch.
+        Example usage:
+            for batch in User.iter_batches(columns=["id", "name"], batch_size=500):
+                . . .
+        """
+        cursor = None
+        while True:
+            page = cls.paginate(where_dict, columns, order_by, batch_size, cursor, descending, replica)
+            if page['items']:
+                yield page['items']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
 
     @classmethod
     def get_all_records(cls):
         """
         Retrieve all records with all columns.
+        Use `iter_batches` for large tables.
         """
         return cls.custom_filter()
 
@@ -103,9 +272,10 @@ class BaseCRUD:
         Check the existence of a record based on the provided filter criteria.
         Returns True if the row is available; otherwise, False.
         """
+        stmt, params = cls._exists_statement(kwargs)
         session = cls.get_session()
         try:
-            return session.query(cls).filter_by(**kwargs).first() is not None
+            return session.execute(stmt, params).first() is not None
         finally:
             session.close()
 
@@ -115,10 +285,12 @@ class BaseCRUD:
         Update rows based on the provided filter criteria and update values.
         Example usage: User.update_by_filter({"id":2}, {"name":"rk3"})
         """
+        stmt, params = cls._update_statement(filter_criteria, update_values)
         session = cls.get_session()
         try:
-            num_updated = session.query(cls).filter_by(**filter_criteria).update(update_values)
+            num_updated = session.execute(stmt, params).rowcount
             session.commit()
+            mark_write()
             return num_updated
         except IntegrityError:
             session.rollback()
@@ -132,10 +304,12 @@ class BaseCRUD:
         Delete rows based on the provided filter criteria.
         Example usage: User.delete_by_filter({"id":3})
         """
+        stmt, params = cls._delete_statement(filter_criteria)
         session = cls.get_session()
         try:
-            num_deleted = session.query(cls).filter_by(**filter_criteria).delete()
+            num_deleted = session.execute(stmt, params).rowcount
             session.commit()
+            mark_write()
             return num_deleted
         except IntegrityError:
             session.rollback()
@@ -143,6 +317,321 @@ class BaseCRUD:
         finally:
             session.close()
 
+    @classmethod
+    def update_many(cls, ids: list, update_values: dict) -> int:
+        """
+        Set the same `update_values` on every row whose primary key is in `ids`, with an
+        `UPDATE ... WHERE id IN (...)` statement per `MAX_BIND_PARAMETERS`, in a single transaction.
+        Returns the number of updated rows.
+        Example usage: User.update_many([1, 2, 3], {"status": "active"})
+        """
+        if not ids:
+            return 0
+        stmt, chunks = cls._update_many_statement(ids, update_values)
+        session = cls.get_session()
+        try:
+            num_updated = sum(session.execute(stmt, params).rowcount for params in chunks)
+            session.commit()
+            mark_write()
+            return num_updated
+        except IntegrityError:
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    @classmethod
+    def update_each(cls, rows: list[dict]) -> int:
+        """
+        Update every row to its own values with `UPDATE ... FROM (VALUES ...)`. Each dict holds the
+        primary key and the values to set, and all of them must set the same columns.
+        The rows are updated in a single transaction, in one statement per `MAX_BIND_PARAMETERS`.
+        Returns the number of updated rows.
+        Example usage: User.update_each([{"id": 1, "name": "rk"}, {"id": 2, "name": "rk2"}])
+        """
+        if not rows:
+            return 0
+        statements = cls._update_each_statements(rows)
+        session = cls.get_session()
+        try:
+            num_updated = sum(session.execute(stmt).rowcount for stmt in statements)
+            session.commit()
+            mark_write()
+            return num_updated
+        except IntegrityError:
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    @classmethod
+    def delete_many(cls, ids: list) -> int:
+        """
+        Delete the rows whose primary key is in `ids` with a statement per `MAX_BIND_PARAMETERS`,
+        in a single transaction. Returns the number of deleted rows.
+        Example usage: User.delete_many([1, 2, 3])
+        """
+        if not ids:
+            return 0
+        stmt, chunks = cls._delete_many_statement(ids)
+        session = cls.get_session()
+        try:
+            num_deleted = sum(session.execute(stmt, params).rowcount for params in chunks)
+            session.commit()
+            mark_write()
+            return num_deleted
+        except IntegrityError:
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    @classmethod
+    def _primary_key(cls):
+        """The primary key column, for the bulk updates and deletes by id."""
+        primary_key = list(cls.__mapper__.primary_key)
+        if len(primary_key) != 1:
+            raise ValueError(f"Bulk updates and deletes need a single-column primary key in '{cls.__tablename__}'")
+        return primary_key[0]
+
+    @classmethod
+    def _update_many_statement(cls, ids: list, update_values: dict) -> tuple:
+        """Cached statement of `update_many`, and its parameters for each chunk of `ids`."""
+        primary_key = cls._primary_key()
+
+        def build():
+            values = {
+                getattr(cls, key): bindparam(f'v_{key}', type_=getattr(cls, key).type)
+                for key in sorted(update_values)
+                }
+            return update(cls).where(primary_key.in_(bindparam('ids', expanding=True))).values(values) \
+                .execution_options(synchronize_session=False)
+
+        stmt = STATEMENT_CACHE.get((cls, 'update_many', tuple(sorted(update_values))), build)
+        values = {f'v_{key}': value for key, value in update_values.items()}
+        return stmt, [{**values, 'ids': chunk} for chunk in _chunks(ids, MAX_BIND_PARAMETERS - len(values))]
+
+    @classmethod
+    def _update_each_statements(cls, rows: list[dict]) -> list:
+        """Statements of `update_each`, joining the table with a VALUES list of at most `MAX_BIND_PARAMETERS` values."""
+        primary_key = cls._primary_key()
+        names = sorted(set(rows[0]) - {primary_key.name})
+        if any(sorted(set(row) - {primary_key.name}) != names or primary_key.name not in row for row in rows):
+            raise ValueError(f"Every row must have '{primary_key.name}' and set the same columns: {names}")
+        missing = [name for name in names if name not in cls.__table__.columns]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in '{cls.__tablename__}'")
+        columns = [primary_key] + [cls.__table__.columns[name] for name in names]
+
+        statements = []
+        size = max(MAX_BIND_PARAMETERS // len(columns), 1)
+        for start in range(0, len(rows), size):
+            source = values(*[column(c.name, c.type) for c in columns], name='bulk_values').data(
+                [tuple(row[c.name] for c in columns) for row in rows[start:start + size]]
+                )
+            statements.append(
+                update(cls.__table__)
+                .where(primary_key == source.c[primary_key.name])
+                .values({c: cast(source.c[c.name], c.type) for c in columns[1:]})
+                )
+        return statements
+
+    @classmethod
+    def _delete_many_statement(cls, ids: list) -> tuple:
+        """Cached statement of `delete_many`, and its parameters for each chunk of `ids`."""
+        primary_key = cls._primary_key()
+        stmt = STATEMENT_CACHE.get(
+            (cls, 'delete_many'),
+            lambda: delete(cls).where(primary_key.in_(bindparam('ids', expanding=True))).execution_options(synchronize_session=False)
+            )
+        return stmt, [{'ids': chunk} for chunk in _chunks(ids, MAX_BIND_PARAMETERS)]
+
+    # Async versions, for the code running on the event loop:
+
+    @staticmethod
+    def async_get_session(replica=False):
+        """Create an asyncio session (asyncpg) to interact with the database. See `get_session` for `replica`."""
+        return async_read_session() if replica else ASYNC_SESSION()
+
+    @classmethod
+    async def async_insert_one(cls, **kwargs):
+        """
+        Async version of `insert_one`.
+        Example usage: await User.async_insert_one(id=1, name="rk", age=30)
+        """
+        async with cls.async_get_session() as session:
+            try:
+                instance = cls(**kwargs)
+                session.add(instance)
+                await session.commit()
+                mark_write()
+                return instance
+            except IntegrityError as e:
+                print(e)
+                await session.rollback()
+                return None
+
+    @classmethod
+    async def async_insert_many(cls, data):
+        """
+        Async version of `insert_many`.
+        Example usage: await User.async_insert_many([{"id":1, "name":"rk", "age":30}, {"id":2, "name":"rk", "age":30}])
+        """
+        async with cls.async_get_session() as session:
+            try:
+                instances = [cls(**item) for item in data]
+                session.add_all(instances)
+                await session.commit()
+                mark_write()
+                return instances
+            except IntegrityError:
+                await session.rollback()
+                return None
+
+    @classmethod
+    async def async_custom_filter(cls, where_dict=None, columns=None, limit=None, offset=None, replica=False) -> list[dict]:
+        """
+        Async version of `custom_filter`.
+        Example usage: await User.async_custom_filter(where_dict={"id": 2}, columns=["name", "age"], limit=3, offset=1)
+        """
+        stmt, params = cls._filter_statement(where_dict, columns, limit, offset)
+        async with cls.async_get_session(replica) as session:
+            results = (await session.execute(stmt, params)).all()
+        names = columns or [column.name for column in cls.__table__.columns]
+        return [dict(zip(names, result)) for result in results]
+
+    @classmethod
+    async def async_paginate(cls, where_dict=None, columns=None, order_by=None, limit=100, cursor=None, descending=False, replica=False) -> dict:
+        """
+        Async version of `paginate`.
+        Example usage: page = await User.async_paginate(order_by="created_at", limit=50, cursor=token)
+        """
+        stmt, columns = cls._page_statement(where_dict, columns, order_by, limit, cursor, descending)
+        async with cls.async_get_session(replica) as session:
+            results = (await session.execute(stmt)).all()
+        return cls._page(results, columns, limit)
+
+    @classmethod
+    async def async_iter_batches(cls, where_dict=None, columns=None, order_by=None, batch_size=1000, descending=False, replica=False):
+        """
+        Async version of `iter_batches`.
+        Example usage:
+            async for batch in User.async_iter_batches(columns=["id", "name"], batch_size=500):
+                . . .
+        """
+        cursor = None
+        while True:
+            page = await cls.async_paginate(where_dict, columns, order_by, batch_size, cursor, descending, replica)
+            if page['items']:
+                yield page['items']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    @classmethod
+    async def async_check_existence(cls, **kwargs):
+        """Async version of `check_existence`."""
+        stmt, params = cls._exists_statement(kwargs)
+        async with cls.async_get_session() as session:
+            return (await session.execute(stmt, params)).first() is not None
+
+    @classmethod
+    async def async_update_by_filter(cls, filter_criteria: dict, update_values: dict):
+        """
+        Async version of `update_by_filter`.
+        Example usage: await User.async_update_by_filter({"id":2}, {"name":"rk3"})
+        """
+        stmt, params = cls._update_statement(filter_criteria, update_values)
+        async with cls.async_get_session() as session:
+            try:
+                result = await session.execute(stmt, params)
+                await session.commit()
+                mark_write()
+                return result.rowcount
+            except IntegrityError:
+                await session.rollback()
+                return 0
+
+    @classmethod
+    async def async_delete_by_filter(cls, filter_criteria):
+        """
+        Async version of `delete_by_filter`.
+        Example usage: await User.async_delete_by_filter({"id":3})
+        """
+        stmt, params = cls._delete_statement(filter_criteria)
+        async with cls.async_get_session() as session:
+            try:
+                result = await session.execute(stmt, params)
+                await session.commit()
+                mark_write()
+                return result.rowcount
+            except IntegrityError:
+                await session.rollback()
+                return 0
+
+    @classmethod
+    async def async_update_many(cls, ids: list, update_values: dict) -> int:
+        """
+        Async version of `update_many`.
+        Example usage: await User.async_update_many([1, 2, 3], {"status": "active"})
+        """
+        if not ids:
+            return 0
+        stmt, chunks = cls._update_many_statement(ids, update_values)
+        async with cls.async_get_session() as session:
+            try:
+                num_updated = 0
+                for params in chunks:
+                    num_updated += (await session.execute(stmt, params)).rowcount
+                await session.commit()
+                mark_write()
+                return num_updated
+            except IntegrityError:
+                await session.rollback()
+                return 0
+
+    @classmethod
+    async def async_update_each(cls, rows: list[dict]) -> int:
+        """
+        Async version of `update_each`.
+        Example usage: await User.async_update_each([{"id": 1, "name": "rk"}, {"id": 2, "name": "rk2"}])
+        """
+        if not rows:
+            return 0
+        statements = cls._update_each_statements(rows)
+        async with cls.async_get_session() as session:
+            try:
+                num_updated = 0
+                for stmt in statements:
+                    num_updated += (await session.execute(stmt)).rowcount
+                await session.commit()
+                mark_write()
+                return num_updated
+            except IntegrityError:
+                await session.rollback()
+                return 0
+
+    @classmethod
+    async def async_delete_many(cls, ids: list) -> int:
+        """
+        Async version of `delete_many`.
+        Example usage: await User.async_delete_many([1, 2, 3])
+        """
+        if not ids:
+            return 0
+        stmt, chunks = cls._delete_many_statement(ids)
+        async with cls.async_get_session() as session:
+            try:
+                num_deleted = 0
+                for params in chunks:
+                    num_deleted += (await session.execute(stmt, params)).rowcount
+                await session.commit()
+                mark_write()
+                return num_deleted
+            except IntegrityError:
+                await session.rollback()
+                return 0
+
     def to_dict(self) -> dict:
         return {c.key: getattr(self, c.key) for c in self.__table__.columns}
 
@@ -162,7 +651,10 @@ class BaseCRUD:
                     result = func(*args, session=session, **kwargs)
                 else:
                     result = func(*args, **kwargs, session=session)
+                wrote = bool(session.new or session.dirty or session.deleted)
                 session.commit()
+                if wrote:
+                    mark_write()
                 return result
             except Exception as e:
                 session.rollback()
@@ -171,7 +663,13 @@ class BaseCRUD:
                 session.close()
         return wrapper
 
-    @staticmethod
-    def __create_all_schemas__():
-        '''Create table'''
-        BASE.metadata.create_all(ENGINE)
\ No newline at end of file
+    @classmethod
+    def __create_all_schemas__(cls):
+        '''Create table, and the indexes missing on an existing one without blocking its writes'''
+        BASE.metadata.create_all(ENGINE)
+        if not cls.__table__.dialect_options['postgresql']['partition_by']:
+            create_missing_indexes(cls.__table__)
+            return
+        # PostgreSQL cannot build the indexes of a partitioned table concurrently.
+        for index in cls.__table__.indexes:
+            index.create(ENGINE, checkfirst=True)
\ No newline at end of file
@@ -0,0 +1,218 @@
+import asyncio
+import contextvars
+from collections import deque
+from datetime import datetime, timedelta
+import asyncpg
+from sqlalchemy import select, tuple_
+from src.connectors.db_connect import DATABASE_URL
+from src.connectors.long_process.async_process import AsyncProcess, EVENTS_CHANNEL
+from src.settings import (
+    SSE_CLIENT_QUEUE_SIZE, SSE_HEARTBEAT_SEC, SSE_POLL_INTERVAL_SEC, BULK_BATCH_SIZE, ASYNC_PROCESS_RETENTION_DAYS
+    )
+
+# Ids of the last published jobs, so a job read both by a poll and a notification is published once.
+RECENT_EVENTS = 1000
+
+
+class EventHub:
+    """
+    In-process broadcaster of the jobs that become 'successful' to the connected SSE clients.
+
+    A single task per process listens to `EVENTS_CHANNEL` (PostgreSQL LISTEN/NOTIFY, notified by a
+    trigger on `mge_async_process`), reads the completed jobs once, and puts each encoded event in
+    the queue of every client. The database load is the same whatever the number of clients, and
+    every instance sees the jobs completed by any worker. Only the jobs with a connected client of
+    their user (or of all users) are sent: they are numbered and marked 'notified' with
+    `AsyncProcess.async_number_events`, the others stay 'successful' until such a client connects.
+
+    The jobs still 'successful' are also read when a client of a user not yet listened to connects
+    and every `SSE_POLL_INTERVAL_SEC` seconds, to catch those completed while nobody was listening.
+    Only the jobs created in the last `ASYNC_PROCESS_RETENTION_DAYS` days are read, so the older
+    partitions are pruned; the retention removes the jobs never delivered by then.
+    Each client has a queue of `SSE_CLIENT_QUEUE_SIZE` events: a client too slow to drain it is
+    disconnected, so it does not hold back the others and can reconnect.
+
+    A client may subscribe to the jobs of a single user, and only receives those. Every event carries
+    the `event_seq` of its job as id, numbered in the order the events are committed, so a client reconnecting with the id of the last event it got
+    (the `Last-Event-ID` header) is first sent the later events of its user, read from the index
+    on `(created_by, event_seq)`, whether they were already notified or not.
+
+    Usage example:
+    --------------
+    ```
+        return StreamingResponse(EVENT_HUB.stream(), media_type="text/event-stream")
+    ```
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._pending = []
+        self._poll = True
+        self._wakeup = None
+        self._task = None
+        self._recent = deque(maxlen=RECENT_EVENTS)
+        self._recent_ids = set()
+
+    def subscribe(self, user: str = None) -> asyncio.Queue:
+        """Queue of the events of a new client, of the jobs of `user` or of all of them. Starts the listener if needed."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            # In an empty context, so the listener does not inherit the context variables of this request.
+            self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self.run())
+        users = set(self._clients.values())
+        if None not in users and user not in users:
+            # Jobs of this user may have been left 'successful' while nobody was listening to them.
+            self._poll = True
+            self._wakeup.set()
+        queue = asyncio.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        self._clients[queue] = user
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._clients.pop(queue, None)
+
+    def publish(self, record: dict):
+        """
+        Put the event of the job `record` in the queue of every client of its user, disconnecting
+        those with a full queue. Events are queued with their id.
+        """
+        event = (record['event_seq'], AsyncProcess.event(record))
+        for queue, user in list(self._clients.items()):
+            if user is not None and user != record['created_by']:
+                continue
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self, user: str = None, last_event_id: int = None):
+        """
+        Server-sent events of a client, of the jobs of `user` or of all of them, with a heartbeat every
+        `SSE_HEARTBEAT_SEC` seconds without events. With `last_event_id`, the later events are replayed first.
+        """
+        # Subscribed before replaying, so no event falls between both; those replayed are skipped afterwards.
+        queue = self.subscribe(user)
+        try:
+            replayed = last_event_id
+            if last_event_id is not None:
+                async for event_seq, event in self.replay(user, last_event_id):
+                    replayed = event_seq
+                    yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    return
+                event_seq, event = event
+                if replayed is not None and event_seq is not None and event_seq <= replayed:
+                    continue
+                yield event
+        finally:
+            self.unsubscribe(queue)
+
+    async def replay(self, user: str, last_event_id: int):
+        """Events of the jobs of `user` (of all users if None) after `last_event_id`, in order, read in pages of `BULK_BATCH_SIZE`."""
+        table = AsyncProcess.__table__
+        stmt = select(table.c.id, table.c.created_by, table.c.output, table.c.event_seq).order_by(table.c.event_seq)
+        stmt = stmt.where(table.c.event_type == AsyncProcess.__message__)
+        if user is not None:
+            stmt = stmt.where(table.c.created_by == user)
+        while True:
+            async with AsyncProcess.async_get_session() as session:
+                records = (await session.execute(
+                    stmt.where(table.c.event_seq > last_event_id).limit(BULK_BATCH_SIZE)
+                    )).mappings().all()
+            for record in records:
+                last_event_id = record['event_seq']
+                yield last_event_id, AsyncProcess.event(record)
+            if len(records) < BULK_BATCH_SIZE:
+                return
+
+    def _notified(self, connection, pid, channel, payload):
+        self._pending.append(payload.encode())
+        self._wakeup.set()
+
+    async def run(self):
+        """Listen to `EVENTS_CHANNEL` and dispatch the completed jobs, reconnecting on errors."""
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(DATABASE_URL)
+                await connection.add_listener(EVENTS_CHANNEL, self._notified)
+                # Notifications may have been missed while disconnected.
+                self._poll = True
+                while True:
+                    await self.dispatch()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), SSE_POLL_INTERVAL_SEC)
+                    except asyncio.TimeoutError:
+                        self._poll = True
+                    self._wakeup.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Event hub: listener failed ({e}), reconnecting')
+                await asyncio.sleep(SSE_POLL_INTERVAL_SEC)
+            finally:
+                if connection is not None:
+                    await connection.close()
+
+    async def dispatch(self):
+        """
+        Publish the notified jobs, and the 'successful' ones when polling, then mark them 'notified'.
+        Both are read in pages of `BULK_BATCH_SIZE`, so a backlog piled up while no client was
+        connected never reaches the limit of bind parameters of a statement.
+        """
+        ids, self._pending = self._pending, []
+        poll, self._poll = self._poll, False
+        if not self._clients or not (ids or poll):
+            return
+        table = AsyncProcess.__table__
+        for start in range(0, len(ids), BULK_BATCH_SIZE):
+            await self._dispatch(table.c.id.in_(ids[start:start + BULK_BATCH_SIZE]))
+        if poll:
+            # Paged by creation, since the jobs without a client stay 'successful'.
+            last = None
+            while True:
+                condition = table.c.status == AsyncProcess.__successful__
+                if last is not None:
+                    condition = condition & (tuple_(table.c.created_timestamp_utc, table.c.id) > last)
+                records = await self._dispatch(condition, BULK_BATCH_SIZE)
+                if len(records) < BULK_BATCH_SIZE:
+                    break
+                last = tuple_(records[-1]['created_timestamp_utc'], records[-1]['id'])
+
+    async def _dispatch(self, condition, limit: int = None) -> list:
+        """
+        Number and publish the jobs matching `condition` with a connected client of their user, in
+        `event_seq` order. Returns the jobs read, in creation order.
+        """
+        table = AsyncProcess.__table__
+        # Only messages are streamed; finished imports stay 'successful' for `/import-jobs/`.
+        since = datetime.utcnow() - timedelta(days=ASYNC_PROCESS_RETENTION_DAYS)
+        condition = (table.c.event_type == AsyncProcess.__message__) & (table.c.created_timestamp_utc >= since) & condition
+        stmt = select(table.c.id, table.c.created_by, table.c.created_timestamp_utc).where(condition)
+        stmt = stmt.order_by(table.c.created_timestamp_utc, table.c.id).limit(limit)
+        async with AsyncProcess.async_get_session() as session:
+            records = (await session.execute(stmt)).mappings().all()
+        users = set(self._clients.values())
+        ids = [record['id'] for record in records if None in users or record['created_by'] in users]
+        if not ids:
+            return records
+        for record in await AsyncProcess.async_number_events(ids):
+            if record['id'] in self._recent_ids:
+                continue
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_ids.discard(self._recent[0])
+            self._recent.append(record['id'])
+            self._recent_ids.add(record['id'])
+            self.publish(record)
+        return records
+
+EVENT_HUB = EventHub()
@@ -0,0 +1,106 @@
+from datetime import datetime
+from sqlalchemy import text
+
+
+def month_start(moment: datetime) -> datetime:
+    """First instant of the month of `moment`."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(start: datetime) -> datetime:
+    """First instant of the month following `start`."""
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """First instant of the month `months` months after the month of `moment`."""
+    start = month_start(moment)
+    for _ in range(months):
+        start = next_month(start)
+    return start
+
+
+class MonthlyPartitions:
+    """
+    Monthly partitions `<table>_pYYYYMM` of a table declared with `PARTITION BY RANGE (<column>)`,
+    plus a `<table>_default` partition receiving the rows of the months not created yet, so inserts
+    never fail. When a month is created, its rows are moved out of the default partition.
+    `storage` is the storage clause of every partition, e.g. `WITH (toast_tuple_target = 128)`.
+    Every method runs on the connection `conn` of the caller's transaction, and takes a transaction
+    advisory lock so instances maintaining the partitions at the same time do not collide.
+
+    Usage example:
+    --------------
+    ```
+        partitions = MonthlyPartitions('events', 'created_at')
+        with ENGINE.begin() as conn:
+            partitions.ensure(conn, datetime(2024, 1, 1), datetime.utcnow())
+    ```
+    """
+
+    def __init__(self, table: str, column: str, storage: str = ''):
+        self.table = table
+        self.column = column
+        self.storage = storage
+        self.default = f'{table}_default'
+
+    def name(self, start: datetime) -> str:
+        return f'{self.table}_p{start:%Y%m}'
+
+    def lock(self, conn):
+        conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:table))'), {'table': self.table})
+
+    def months(self, conn) -> dict:
+        """Start of each existing monthly partition, by partition name."""
+        names = conn.execute(text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(:table)'
+            ), {'table': self.table}).scalars()
+        prefix = f'{self.table}_p'
+        return {
+            name: datetime.strptime(name[len(prefix):], '%Y%m')
+            for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()
+            }
+
+    def ensure(self, conn, start: datetime, end: datetime) -> list:
+        """Create the default partition and the monthly partitions from `start` to `end`. Returns the created ones."""
+        self.lock(conn)
+        if conn.execute(text('SELECT to_regclass(:name)'), {'name': self.default}).scalar() is None:
+            conn.execute(text(f'CREATE TABLE {self.default} PARTITION OF {self.table} DEFAULT {self.storage}'))
+        existing = set(self.months(conn))
+        created = []
+        month = month_start(start)
+        while month <= end:
+            name = self.name(month)
+            if name not in existing:
+                self._create(conn, name, month, next_month(month))
+                created.append(name)
+            month = next_month(month)
+        return created
+
+    def _create(self, conn, name: str, start: datetime, end: datetime):
+        # Attaching a partition fails while the default one holds rows of its range, so they are moved first.
+        bounds = f"FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+        conn.execute(text(f'CREATE TABLE {name} (LIKE {self.table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) {self.storage}'))
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM {self.default} WHERE {self.column} >= :start AND {self.column} < :end RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved'
+            ), {'start': start, 'end': end})
+        conn.execute(text(f'ALTER TABLE {self.table} ATTACH PARTITION {name} FOR VALUES {bounds}'))
+
+    def drop_before(self, conn, cutoff: datetime, only_empty: bool = True) -> list:
+        """
+        Drop the monthly partitions ending before `cutoff`; with `only_empty`, only those without rows.
+        Returns the dropped ones.
+        """
+        self.lock(conn)
+        dropped = []
+        for name, start in sorted(self.months(conn).items(), key=lambda item: item[1]):
+            if next_month(start) > cutoff:
+                continue
+            if only_empty and conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM {name})')).scalar():
+                continue
+            conn.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+        return dropped
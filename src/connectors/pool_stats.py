@@ -0,0 +1,98 @@
+import threading
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """
+    Counters of a connection pool: acquisitions, time waited to acquire a connection,
+    overflow connections opened beyond `pool_size` and checkouts that timed out.
+    """
+
+    def __init__(self, pool_size: int = 5, max_overflow: int = 10):
+        self._lock = threading.Lock()
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.connections = 0
+        self.acquisitions = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def acquired(self, wait: float):
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def opened(self):
+        with self._lock:
+            self.connections += 1
+            if self.connections > self.pool_size:
+                self.overflow_events += 1
+
+    def closed(self):
+        with self._lock:
+            self.connections -= 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def to_dict(self, pool) -> dict:
+        """Counters together with the current state of `pool`, read through its public API."""
+        with self._lock:
+            return {
+                'pool_size': pool.size(),
+                'max_overflow': self.max_overflow,
+                'checked_out': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'acquisitions': self.acquisitions,
+                'wait_avg_ms': round(self.wait_total / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'overflow_events': self.overflow_events,
+                'timeouts': self.timeouts,
+                }
+
+
+class InstrumentedPool:
+    """
+    Mixin timing every checkout of a queue pool into its `stats`, and counting the connections
+    it opens and closes through the pool events.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats(kwargs.get('pool_size', 5), kwargs.get('max_overflow', 10))
+        # `recreate` passes the events of the previous pool, already counting into the same stats.
+        if '_dispatch' not in kwargs:
+            event.listen(self, 'connect', lambda *args: self.stats.opened())
+            event.listen(self, 'close', lambda *args: self.stats.closed())
+            event.listen(self, 'detach', lambda *args: self.stats.closed())
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timed_out()
+            raise
+        self.stats.acquired(perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,133 @@
+import heapq
+import threading
+from time import perf_counter
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from src.connectors.db_connect import ENGINE, ASYNC_ENGINE, REPLICA_ENGINES, ASYNC_REPLICA_ENGINES
+from src.settings import SQL_PROFILING_SLOWEST, SQL_N_PLUS_ONE_THRESHOLD
+
+# Statements are stored truncated to this length.
+STATEMENT_LENGTH = 500
+
+SQL_PROFILE = ContextVar('SQL_PROFILE', default=None)
+
+
+class SqlProfile:
+    """
+    Statements executed while a request (or task) is profiled: how many, the time spent in
+    the database, the `SQL_PROFILING_SLOWEST` slowest ones, and how often each one repeated.
+    A statement repeated at least `SQL_N_PLUS_ONE_THRESHOLD` times is flagged as an N+1:
+    a loop issuing one statement per item instead of a single set-based one.
+    Executemany batches count as one execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.total = 0.0
+        self.slowest = []
+        self.repeats = Counter()
+
+    def add(self, statement: str, seconds: float):
+        statement = statement[:STATEMENT_LENGTH]
+        with self._lock:
+            self.statements += 1
+            self.total += seconds
+            self.repeats[statement] += 1
+            if len(self.slowest) < SQL_PROFILING_SLOWEST:
+                heapq.heappush(self.slowest, (seconds, statement))
+            elif self.slowest and seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, statement))
+
+    def n_plus_one(self) -> list:
+        """Statements repeated at least `SQL_N_PLUS_ONE_THRESHOLD` times, with their count."""
+        with self._lock:
+            return [(statement, count) for statement, count in self.repeats.most_common() if count >= SQL_N_PLUS_ONE_THRESHOLD]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'statements': self.statements,
+                'sql_ms': round(self.total * 1000, 3),
+                'slowest': [
+                    {'ms': round(seconds * 1000, 3), 'statement': statement}
+                    for seconds, statement in sorted(self.slowest, reverse=True)
+                    ],
+                }
+
+
+class SqlMetrics:
+    """
+    SQL profiles of the requests, aggregated by route: requests, statements, time spent in the
+    database, the slowest statements and the N+1 statements flagged, with the requests flagging them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, profile: SqlProfile):
+        stats = profile.to_dict()
+        n_plus_one = profile.n_plus_one()
+        with self._lock:
+            metrics = self._routes.setdefault(route, {
+                'requests': 0, 'statements': 0, 'sql_ms': 0.0, 'max_sql_ms': 0.0,
+                'slowest': [], 'n_plus_one': Counter(),
+                })
+            metrics['requests'] += 1
+            metrics['statements'] += stats['statements']
+            metrics['sql_ms'] += stats['sql_ms']
+            metrics['max_sql_ms'] = max(metrics['max_sql_ms'], stats['sql_ms'])
+            slowest = metrics['slowest'] + [(item['ms'], item['statement']) for item in stats['slowest']]
+            metrics['slowest'] = heapq.nlargest(SQL_PROFILING_SLOWEST, slowest)
+            metrics['n_plus_one'].update(statement for statement, _ in n_plus_one)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    'requests': metrics['requests'],
+                    'statements': metrics['statements'],
+                    'sql_ms': round(metrics['sql_ms'], 3),
+                    'avg_sql_ms': round(metrics['sql_ms'] / metrics['requests'], 3),
+                    'max_sql_ms': metrics['max_sql_ms'],
+                    'slowest': [{'ms': ms, 'statement': statement} for ms, statement in metrics['slowest']],
+                    'n_plus_one': [
+                        {'statement': statement, 'requests': requests}
+                        for statement, requests in metrics['n_plus_one'].most_common()
+                        ],
+                    }
+                for route, metrics in self._routes.items()
+                }
+
+
+SQL_METRICS = SqlMetrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if SQL_PROFILE.get() is not None:
+        conn.info.setdefault('sql_profile_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = SQL_PROFILE.get()
+    starts = conn.info.get('sql_profile_start')
+    if profile is not None and starts:
+        profile.add(statement, perf_counter() - starts.pop())
+
+
+def attach_engines():
+    """
+    Listen to the statements of every engine (sync, asyncio and replicas). They are only
+    recorded while a `SqlProfile` is set in `SQL_PROFILE`, e.g. by `SqlProfilingMiddleware`.
+    """
+    engines = [ENGINE, ASYNC_ENGINE.sync_engine] + REPLICA_ENGINES + [engine.sync_engine for engine in ASYNC_REPLICA_ENGINES]
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
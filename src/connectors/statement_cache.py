@@ -0,0 +1,77 @@
+import threading
+from sqlalchemy import bindparam
+
+
+class StatementCache:
+    """
+    Cache of parameterized statements, built once per shape and reused with new parameters.
+
+    Statements are keyed by their shape (e.g. model, kind of statement, filter keys and columns)
+    and compare the columns with bind parameters instead of literal values, so every call with the
+    same shape runs the same statement object: it is neither rebuilt nor traversed again to compute
+    its key in the compiled cache of the engine, which then compiles it only once.
+
+    Usage example:
+    --------------
+    ```
+        stmt = STATEMENT_CACHE.get(('users', 'by_name'), lambda: select(User).where(User.name == bindparam('name')))
+        session.execute(stmt, {'name': 'rk'})
+    ```
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, build):
+        """Return the statement cached for `key`, building it with `build()` on a miss."""
+        with self._lock:
+            stmt = self._statements.get(key)
+            if stmt is not None:
+                self.hits += 1
+                return stmt
+            self.misses += 1
+        stmt = build()
+        with self._lock:
+            return self._statements.setdefault(key, stmt)
+
+    def clear(self):
+        with self._lock:
+            self._statements.clear()
+            self.hits = self.misses = 0
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'statements': len(self._statements),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                }
+
+
+def where_clauses(model, criteria: dict) -> list:
+    """
+    Conditions equivalent to `filter_by(**criteria)`, comparing each column with a bind parameter
+    named `w_<column>`. As with `filter_by`, None values are compared with IS NULL.
+    """
+    return [
+        getattr(model, key).is_(None) if value is None else getattr(model, key) == bindparam(f'w_{key}')
+        for key, value in sorted(criteria.items())
+        ]
+
+
+def where_key(criteria: dict) -> tuple:
+    """Shape of `criteria` in the key of a statement filtered with `where_clauses`."""
+    return tuple((key, criteria[key] is None) for key in sorted(criteria))
+
+
+def where_params(criteria: dict) -> dict:
+    """Parameters of a statement filtered with `where_clauses`."""
+    return {f'w_{key}': value for key, value in criteria.items() if value is not None}
+
+
+STATEMENT_CACHE = StatementCache()
@@ -2,18 +2,37 @@
 '''
 This file includes the API endpoints for the application.
 '''
-from fastapi import APIRouter
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
 from src.connectors.application_tables.jobs import Job
-from fastapi import File, UploadFile
+from fastapi import BackgroundTasks, File, UploadFile
 from src.connectors.application_tables.departments import Department
 from src.connectors.application_tables.hired_employees import HiredEmployees
 from src.connectors.create_schemas import ALLOWED_ENTITIES
-from src.controllers.api.schemas.application_schemas import (InsertJob, InsertDepartment, InsertHiredEmployees)
+from src.connectors.long_process.async_process import AsyncProcess
+from src.connectors.application_tables.csv_stream import spool_upload
+from src.connectors.application_tables.bulk_loader import IMPORT_MODES
+from src.controllers.pub_sub.processes import csv_import_process
+from src.controllers.api.responses import DuplexStreamingResponse, RequestBody
+from fastapi.responses import StreamingResponse
+from src.connectors.application_tables.export_stream import EXPORT_FORMATS, entity_statement, iter_export
+from src.controllers.api.schemas.application_schemas import (
+    InsertJob, InsertDepartment, InsertHiredEmployees, ENTITY_STRUCTURES)
 
 router = APIRouter()
 
 @router.post("/import-from-csv/{entity}/", tags=["Import API"])
-async def upload_job_csv(entity: str, file: UploadFile = File(...)):
+async def upload_job_csv(
+    entity: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    mode: str = 'row',
+    summary: bool = False,
+    background: bool = False,
+    parallel: bool = False,
+    user: Optional[str] = None):
     '''
     <h3>Allowed values for entity:</h3>
     <ul>
@@ -21,14 +40,179 @@ async def upload_job_csv(entity: str, file: UploadFile = File(...)):
         <li>departments</li>
         <li>hiredEmployees</li>
     </ul>
+    <h3>Allowed file formats:</h3>
+    <ul>
+        <li>CSV (.csv), without header.</li>
+        <li>Parquet (.parquet) and Arrow IPC (.arrow, .feather, .ipc), with the columns of the entity by name.
+        They are always bulk loaded and "mode" and "parallel" do not apply.</li>
+    </ul>
+    <h3>Allowed values for mode:</h3>
+    <ul>
+        <li>row: one insert per CSV row (default).</li>
+        <li>copy: bulk load through PostgreSQL COPY, recommended for large files.</li>
+    </ul>
+    <h3>summary:</h3>
+    <h4>When true, "valids" is returned as the number of inserted rows instead of the rows themselves.</h4>
+    <h3>background:</h3>
+    <h4>When true, the import runs as a background job and its id is returned immediately.
+    Follow its progress with <code>/import-jobs/{job_id}/</code>. Background jobs always store a summary report.</h4>
+    <h3>parallel:</h3>
+    <h4>When true, the file is parsed and validated in a process pool, one byte range per worker.
+    Requires one record per line (no line breaks inside quoted fields).</h4>
+
+        {
+            "response": {"job_id": string, "status": "pending"}
+        }
     '''
     if entity not in ALLOWED_ENTITIES.keys():
         return {"response": f"Entity '{entity}' found"}
     entity_obj = ALLOWED_ENTITIES[entity]
-    response = await entity_obj.instert_from_csv(file)
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Import mode '{mode}' not supported, use one of {IMPORT_MODES}")
+    if background:
+        job = await AsyncProcess.async_insert_message(
+            event_type=AsyncProcess.__csv_import__,
+            status=AsyncProcess.__pending__,
+            input={'entity': entity, 'mode': mode, 'parallel': parallel, 'filename': file.filename},
+            attempts=0,
+            created_by=user,
+            updated_by=user,
+        )
+        try:
+            path = await spool_upload(file)
+        except Exception as error:
+            await AsyncProcess.async_update_by_filter(
+                filter_criteria={'id': job['id']},
+                update_values={
+                    'status': AsyncProcess.__failed__,
+                    'job_metadata': {'error': str(error)},
+                    'updated_timestamp_utc': datetime.utcnow(),
+                    }
+                )
+            raise
+        background_tasks.add_task(csv_import_process, job['id'], entity, path, mode, parallel)
+        return {"response": {"job_id": job['id'].decode(), "status": job['status']}}
+    response = await entity_obj.instert_from_csv(file, mode=mode, summary=summary, parallel=parallel)
     return {"response": response}
 
 
+@router.get("/import-jobs/{job_id}/", tags=["Import API"])
+async def get_import_job(job_id: str):
+    '''
+    <h3>Description:</h3>
+    <h4>Status and progress of an import submitted with <code>background=true</code>.</h4>
+    <h3>Output example:</h3>
+
+        {
+            "response": {
+                "job_id": string,
+                "status": "in_progress",
+                "job_metadata": {"entity": "hiredEmployees", "mode": "copy", "rows_processed": 20000, "rows_rejected": 12},
+                "output": null
+            }
+        }
+    '''
+    jobs = await AsyncProcess.async_custom_filter(
+        where_dict={'id': job_id.encode(), 'event_type': AsyncProcess.__csv_import__},
+        columns=['status', 'job_metadata', 'output']
+        )
+    if not jobs:
+        return {"response": f"Import job '{job_id}' not found"}
+    return {"response": {"job_id": job_id, **jobs[0]}}
+
+
+@router.post("/stream-insert/{entity}/", tags=["Import API"])
+async def stream_insert(entity: str, request: Request):
+    '''
+    <h3>Allowed values for entity:</h3>
+    <ul>
+        <li>jobs</li>
+        <li>departments</li>
+        <li>hiredEmployees</li>
+    </ul>
+    <h3>Description:</h3>
+    <h4>Streaming bulk insert. The body is an <code>application/x-ndjson</code> feed, one object per line
+    with the structure of the <code>/insert/*</code> endpoints. Lines are validated and inserted in batches
+    while the body is still arriving, and the result of each batch is streamed back as one NDJSON line.
+    </h4>
+    <h3>Input example:</h3>
+
+        {"id": 1, "job": "Marketing Assistant"}
+        {"id": 2, "job": "VP Sales"}
+
+    <h3>Output example:</h3>
+
+        {"batch": 1, "valids": [{"id": 1, "job": "Marketing Assistant"}], "invalids": [{"line": 2, "error": "..."}]}
+    '''
+    if entity not in ENTITY_STRUCTURES.keys():
+        return {"response": f"Entity '{entity}' not found"}
+    body = RequestBody(request)
+    batches = ALLOWED_ENTITIES[entity].stream_models(body.stream(), ENTITY_STRUCTURES[entity])
+    return DuplexStreamingResponse(
+        (json.dumps(batch) + '\n' async for batch in batches),
+        body,
+        media_type='application/x-ndjson'
+        )
+
+
+@router.get("/export/hired-employees-by-quarter/", tags=["Export API"])
+async def export_hired_employees_by_quarter(year: int = 2021, format: str = 'csv'):
+    '''
+    <h3>Description:</h3>
+    <h4>Streaming export of the report of <code>/hired-employees-by-quarter/</code>, read with a
+    server-side cursor and sent as it is read.</h4>
+    <h3>Allowed values for format:</h3>
+    <ul>
+        <li>csv: with a header row (default).</li>
+        <li>ndjson: one JSON object per line.</li>
+    </ul>
+    <h3>Output example (csv):</h3>
+
+        department,job,Q1,Q2,Q3,Q4
+        Accounting,Account Representative IV,1,0,0,0
+    '''
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Export format '{format}' not supported, use one of {tuple(EXPORT_FORMATS)}")
+    return StreamingResponse(
+        iter_export(HiredEmployees.by_quarter_statement(year), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="hired_employees_by_quarter_{year}.{format}"'}
+        )
+
+
+@router.get("/export/{entity}/", tags=["Export API"])
+async def export_entity(entity: str, format: str = 'csv'):
+    '''
+    <h3>Allowed values for entity:</h3>
+    <ul>
+        <li>jobs</li>
+        <li>departments</li>
+        <li>hiredEmployees</li>
+    </ul>
+    <h3>Description:</h3>
+    <h4>Streaming export of every row of the entity ordered by id, read with a server-side cursor
+    and sent as it is read, so memory use does not depend on the size of the table.</h4>
+    <h3>Allowed values for format:</h3>
+    <ul>
+        <li>csv: with a header row (default).</li>
+        <li>ndjson: one JSON object per line.</li>
+    </ul>
+    <h3>Output example (ndjson):</h3>
+
+        {"id": 1, "job": "Marketing Assistant"}
+        {"id": 2, "job": "VP Sales"}
+    '''
+    if entity not in ENTITY_STRUCTURES.keys():
+        return {"response": f"Entity '{entity}' not found"}
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Export format '{format}' not supported, use one of {tuple(EXPORT_FORMATS)}")
+    return StreamingResponse(
+        iter_export(entity_statement(ALLOWED_ENTITIES[entity]), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{entity}.{format}"'}
+        )
+
+
 @router.post("/insert/job/", tags=["Job APIs"])
 async def insert_job(body_params : InsertJob):
     '''
@@ -144,7 +328,7 @@ async def get_hired_employees_by_quarter(year: int = 2021):
     return result
 
 @router.get("/hired-employees-above-average/", tags=["Hired employees APIs"])
-async def get_hired_employees_above_average(year: int = 2021):
+async def get_hired_employees_above_average(year: int = 2021, percentile: Optional[float] = None, top: Optional[int] = None):
     '''
     <h3>Description:</h3>
     <h4>List of ids, name and number of employees hired of each department that hired more
@@ -154,6 +338,9 @@ async def get_hired_employees_above_average(year: int = 2021):
     <h3>Input value:</h3>
 
         year: int
+        percentile: float (optional) Instead of the mean, list the departments at or above this
+            percentile (0-100) of employees hired per department.
+        top: int (optional) List only the ~top~ departments that hired most employees (ties included).
 
     <h3>Output example:</h3>
 
@@ -168,7 +355,7 @@ async def get_hired_employees_above_average(year: int = 2021):
             "invalids": []
         }
     '''
-    result = await HiredEmployees.get_departments_above_average(year)
+    result = await HiredEmployees.get_departments_above_average(year, percentile, top)
     return result
 
 @router.get("/test_ds_model/", tags=["DS APIs"])
@@ -187,5 +374,7 @@ def test_ds_model(number: int = 8):
         }
     '''
     from src.main import DS_MODEL
+    if DS_MODEL is None:
+        raise HTTPException(status_code=503, detail='The DS model is still loading')
     result = DS_MODEL(number)
     return {'result': result}
\ No newline at end of file
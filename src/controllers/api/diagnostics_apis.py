@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+'''
+This file includes the diagnostics endpoints of the service.
+'''
+from fastapi import APIRouter
+from src.connectors.db_connect import pool_status
+from src.connectors.long_process.base import BaseCRUD
+from src.connectors.sql_profiler import SQL_METRICS
+from src.settings import SQL_PROFILING_ENABLED
+
+router = APIRouter()
+
+@router.get("/diagnostics/db-pool/", tags=["Diagnostics APIs"])
+async def db_pool():
+    '''
+    <h3>Description:</h3>
+    <h4>State and counters of the connection pools of this worker, to size <code>DB_POOL_SIZE</code>
+    and <code>DB_MAX_OVERFLOW</code> against the PostgreSQL <code>max_connections</code>. Both are
+    split between the sync and async pools, the async one getting <code>DB_ASYNC_POOL_PERCENT</code>.</h4>
+    <ul>
+        <li>checked_out / idle / overflow: connections in use, idle in the pool, and opened beyond pool_size.</li>
+        <li>wait_avg_ms / wait_max_ms: time to acquire a connection, including opening it.</li>
+        <li>overflow_events: connections opened beyond pool_size since start.</li>
+        <li>timeouts: checkouts that waited more than <code>DB_POOL_TIMEOUT_SEC</code>.</li>
+    </ul>
+    <h3>Output example:</h3>
+
+        {
+            "response": {
+                "sync": {"pool_size": 3, "max_overflow": 5, "checked_out": 1, "idle": 2, "overflow": 0,
+                         "acquisitions": 1200, "wait_avg_ms": 0.041, "wait_max_ms": 12.3,
+                         "overflow_events": 0, "timeouts": 0},
+                "async": {...}
+            }
+        }
+    '''
+    return {"response": pool_status()}
+
+
+@router.get("/diagnostics/statement-cache/", tags=["Diagnostics APIs"])
+async def statement_cache():
+    '''
+    <h3>Description:</h3>
+    <h4>Hit rate of the parameterized statements cached by the CRUD methods of this worker.</h4>
+    <ul>
+        <li>statements: distinct statement shapes (model, filter keys and columns) built so far.</li>
+        <li>hits / misses / hit_rate: lookups served by an already built statement, and those that built one.</li>
+        <li>compiled: statements held by the compiled cache of the sync and async engines.</li>
+    </ul>
+    <h3>Output example:</h3>
+
+        {
+            "response": {"statements": 4, "hits": 1996, "misses": 4, "hit_rate": 0.998,
+                         "compiled": {"sync": 12, "async": 5}}
+        }
+    '''
+    return {"response": BaseCRUD.statement_cache_stats()}
+
+
+@router.get("/diagnostics/sql-profile/", tags=["Diagnostics APIs"])
+async def sql_profile():
+    '''
+    <h3>Description:</h3>
+    <h4>SQL statements of the requests served by this worker, by route. Enabled with <code>SQL_PROFILING_ENABLED</code>.</h4>
+    <ul>
+        <li>statements / sql_ms / avg_sql_ms / max_sql_ms: statements executed and time spent in the database.</li>
+        <li>slowest: the <code>SQL_PROFILING_SLOWEST</code> slowest statements of the route.</li>
+        <li>n_plus_one: statements executed at least <code>SQL_N_PLUS_ONE_THRESHOLD</code> times in one request,
+        with the number of requests that did it.</li>
+    </ul>
+    <h3>Output example:</h3>
+
+        {
+            "response": {
+                "enabled": true,
+                "routes": {
+                    "GET /import-jobs/{job_id}/": {"requests": 12, "statements": 12, "sql_ms": 30.4, "avg_sql_ms": 2.533,
+                                                   "max_sql_ms": 4.1, "slowest": [{"ms": 4.1, "statement": "SELECT ..."}],
+                                                   "n_plus_one": []}
+                }
+            }
+        }
+    '''
+    return {"response": {"enabled": SQL_PROFILING_ENABLED, "routes": SQL_METRICS.to_dict()}}
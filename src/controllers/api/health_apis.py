@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+'''
+This file includes the liveness and readiness endpoints of the service.
+'''
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from src.connectors.db_connect import db_health
+from src.utils.startup import STARTUP
+
+router = APIRouter()
+
+@router.get("/health/live/", tags=["Health APIs"])
+async def live():
+    '''
+    <h3>Description:</h3>
+    <h4>Liveness probe: answers as soon as the server is listening, while the startup phases are still running.</h4>
+    <h3>Output example:</h3>
+
+        {
+            "response": "alive"
+        }
+    '''
+    return {"response": "alive"}
+
+
+@router.get("/health/ready/", tags=["Health APIs"])
+def ready():
+    '''
+    <h3>Description:</h3>
+    <h4>Readiness probe: 200 once every startup phase succeeded and the database is reachable, 503 otherwise.
+    The response includes the timing of each startup phase.</h4>
+    <h3>Output example:</h3>
+
+        {
+            "response": {
+                "ready": true,
+                "total_ms": 10012.4,
+                "phases": {
+                    "imports": {"status": "ok", "duration_ms": 1210.3, "error": null},
+                    "ds_model": {"status": "ok", "duration_ms": 10011.9, "error": null},
+                    "database": {"status": "ok", "duration_ms": 35.2, "error": null},
+                    "pubsub": {"status": "ok", "duration_ms": 1.1, "error": null}
+                },
+                "database": true
+            }
+        }
+    '''
+    report = STARTUP.to_dict()
+    report['database'] = db_health() if STARTUP.ready else False
+    report['ready'] = report['database']
+    return JSONResponse(status_code=200 if report['ready'] else 503, content={"response": report})
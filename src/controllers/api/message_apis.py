@@ -2,7 +2,8 @@
 '''
 This file includes the API endpoints for the application.
 '''
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Header
 from fastapi.responses import StreamingResponse
 from src.controllers.pub_sub.publisher import Publisher
 from src.controllers.api.schemas.message_schemas import SendMessage
@@ -26,9 +27,8 @@ async def insert_message(body_params : SendMessage):
         A dictionary representation of the inserted message record.
     """
 
-    message = AsyncProcess()
-    message = message.insert_message(
-        event_type='message',
+    message = await AsyncProcess.async_insert_message(
+        event_type=AsyncProcess.__message__,
         status='pending',
         input=dict(body_params),
         attempts=0,
@@ -40,18 +40,28 @@ async def insert_message(body_params : SendMessage):
 
 
 @router.get("/stream")
-async def stream():
+async def stream(user: Optional[str] = None, last_event_id: Optional[int] = Header(None)):
     """
     Endpoint to stream messages from the async process system.
 
     This endpoint returns a Server-Sent Events (SSE) stream of messages,
-    where each message is a JSON object with the keys 'id', 'output', and 'status'.
-    The 'status' key is set to 'successful' if the message was processed successfully,
-    'failed' if it failed, and 'pending' if it is still waiting to be processed.
+    where each message is a JSON object with the keys 'id', 'user', and 'response'
+    of a process that completed successfully.
+    The events are pushed by a single in-process broadcaster (see `EventHub`), so the
+    database load does not depend on the number of connected clients.
+    Each event has an increasing id. A client reconnecting with the `Last-Event-ID` header
+    (sent by browsers automatically) first receives the events it missed.
+
+    Args:
+    -----
+    user : str, optional
+        Only stream the messages created by this user. All of them if not given.
+    last_event_id : int, optional
+        The `Last-Event-ID` header, id of the last event received by the client.
 
     Returns:
     --------
     StreamingResponse
         A StreamingResponse object with the SSE stream.
     """
-    return StreamingResponse(AsyncProcess.event_stream(), media_type="text/event-stream")
\ No newline at end of file
+    return StreamingResponse(AsyncProcess.event_stream(user, last_event_id), media_type="text/event-stream")
\ No newline at end of file
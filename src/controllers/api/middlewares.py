@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+'''
+This file includes the ASGI middlewares of the application.
+'''
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from src.connectors.db_connect import READ_PIN, ReadPin
+from src.connectors.sql_profiler import SQL_METRICS, SQL_PROFILE, SqlProfile
+from src.settings import DB_READ_YOUR_WRITES_SEC, ENVIRONMENT, localhost
+
+READ_PIN_COOKIE = 'db_read_pin'
+
+
+class ReadYourWritesMiddleware:
+    """
+    Read-your-writes across requests when read replicas are configured.
+
+    Each request gets a `ReadPin` restored from the `db_read_pin` cookie. When the request writes,
+    the cookie is set with the time until which the reads of that client stay on the primary,
+    so its next report or listing sees the write even if the replicas lag.
+    The cookie is only set for writes done before the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        try:
+            until = float(HTTPConnection(scope).cookies.get(READ_PIN_COOKIE, 0))
+        except ValueError:
+            until = 0.0
+        pin = ReadPin(until)
+
+        async def send_with_pin(message):
+            if message['type'] == 'http.response.start' and pin.wrote:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'set-cookie',
+                    f'{READ_PIN_COOKIE}={pin.until}; Max-Age={DB_READ_YOUR_WRITES_SEC}; Path=/; HttpOnly; SameSite=Lax'
+                    )
+            await send(message)
+
+        token = READ_PIN.set(pin)
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            READ_PIN.reset(token)
+
+
+class SqlProfilingMiddleware:
+    """
+    Profile the SQL statements of every request (see `SqlProfile`) and aggregate them by route
+    in `SQL_METRICS`, served by `/diagnostics/sql-profile/`. Requests flagged as N+1 are logged.
+    Requires the engine events of `attach_engines`.
+
+    In development (`localhost` and `develop` environments) the profile is also returned in the `X-SQL-Statements`, `X-SQL-Time-Ms` and
+    `X-SQL-N-Plus-One` headers. They only cover the statements run before the response starts,
+    so not those of a streaming body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        profile = SqlProfile()
+
+        async def send_with_profile(message):
+            if message['type'] == 'http.response.start' and ENVIRONMENT in (localhost, 'develop'):
+                stats = profile.to_dict()
+                headers = MutableHeaders(scope=message)
+                headers.append('x-sql-statements', str(stats['statements']))
+                headers.append('x-sql-time-ms', str(stats['sql_ms']))
+                headers.append('x-sql-n-plus-one', str(len(profile.n_plus_one())))
+            await send(message)
+
+        token = SQL_PROFILE.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            SQL_PROFILE.reset(token)
+            route = scope.get('route')
+            name = f"{scope['method']} {route.path if route is not None else '<unmatched>'}"
+            SQL_METRICS.record(name, profile)
+            for statement, count in profile.n_plus_one():
+                print(f'N+1 on {name}: {count} executions of {statement!r}')
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+This file includes the custom responses used by the API endpoints.
+'''
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+
+class RequestBody:
+    """
+    Body of a request consumed by the iterator of a `DuplexStreamingResponse`.
+    `read` is set once the whole body has been received.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        self.read = anyio.Event()
+
+    async def stream(self):
+        async for chunk in self.request.stream():
+            yield chunk
+        self.read.set()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    `StreamingResponse` that can be streamed while the request body is still being read.
+
+    The default `StreamingResponse` listens for the client disconnection by consuming the
+    `receive` channel, which also swallows the body chunks. This response lets its iterator
+    consume the body through `body.stream()`, and only listens for the disconnection once the body
+    has been read. A disconnection while the body is read is raised by `Request.stream()` itself.
+    Either way the iterator is cancelled, so an aborted client does not keep it running.
+
+    Usage example:
+    --------------
+    ```
+        body = RequestBody(request)
+        return DuplexStreamingResponse(process(body.stream()), body, media_type='application/x-ndjson')
+    ```
+    """
+
+    def __init__(self, content, body: RequestBody, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body = body
+
+    async def __call__(self, scope, receive, send):
+        async with anyio.create_task_group() as task_group:
+
+            async def watch_disconnect():
+                await self.body.read.wait()
+                await self.listen_for_disconnect(receive)
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(watch_disconnect)
+            await self.stream_response(send)
+            task_group.cancel_scope.cancel()
+
+        if self.background is not None:
+            await self.background()
@@ -45,4 +45,13 @@ class InsertHiredEmployees(BaseModel):
     """
     Params to insert a new Department to the list.
     """
-    hired_employees : List[HiredEmployeesStructure]
\ No newline at end of file
+    hired_employees : List[HiredEmployeesStructure]
+
+
+#----------------------------------Streaming---------------------------------
+
+ENTITY_STRUCTURES = {
+    'jobs': JobStructure,
+    'departments': DepartmentStructure,
+    'hiredEmployees': HiredEmployeesStructure,
+    }
@@ -1,8 +1,12 @@
+import os
 import random
+import asyncio
 import threading
 from time import sleep
 from datetime import datetime
+from fastapi import UploadFile
 from src.services.deepseek.interface import DeepSeek
+from src.connectors.create_schemas import ALLOWED_ENTITIES
 from src.connectors.long_process.async_process import AsyncProcess
 
 __LOCK__ = threading.Lock()
@@ -106,3 +110,55 @@ def async_process_core_callback(message):
                     }
                 )
         message.ack()
+
+
+def csv_import_process(job_id: bytes, entity: str, path: str, mode: str, parallel: bool = False):
+    """
+    Runs a CSV import submitted as a background job.
+
+    The job is tracked in the AsyncProcess table: it moves to 'in_progress', `job_metadata` is
+    updated with the rows processed and rejected after every batch, and it ends as 'successful'
+    with the summary report in `output`, or as 'failed' with the error.
+    The import runs on its own event loop, so it is meant to be called from a worker thread.
+    The spooled file at `path` is removed at the end.
+
+    Args:
+    -----
+        job_id (bytes): The id of the AsyncProcess record of the job.
+        entity (str): The entity to import, one of ALLOWED_ENTITIES.
+        path (str): The path of the spooled CSV file.
+        mode (str): The import mode, 'row' or 'copy'.
+        parallel (bool): Whether to parse the file in the process pool.
+
+    Returns:
+    -------
+        None
+    """
+    ap = AsyncProcess()
+    metadata = {'entity': entity, 'mode': mode, 'parallel': parallel, 'rows_processed': 0, 'rows_rejected': 0}
+
+    def update_job(**values):
+        ap.update_by_filter(
+            filter_criteria={'id': job_id},
+            update_values={**values, 'job_metadata': dict(metadata), 'updated_timestamp_utc': datetime.utcnow()}
+            )
+
+    def progress(report):
+        metadata['rows_processed'] = report.valid_count + report.invalid_count
+        metadata['rows_rejected'] = report.invalid_count
+        update_job()
+
+    update_job(status=ap.__in_progress__, attempts=1)
+    try:
+        with open(path, 'rb') as f:
+            upload = UploadFile(file=f, filename=os.path.basename(path))
+            response = asyncio.run(
+                ALLOWED_ENTITIES[entity].instert_from_csv(
+                    upload, mode=mode, summary=True, progress=progress, parallel=parallel)
+                )
+        update_job(status=ap.__successful__, output={'response': response})
+    except Exception as error:
+        metadata['error'] = str(error)
+        update_job(status=ap.__failed__)
+    finally:
+        os.remove(path)
@@ -1,5 +1,5 @@
+import threading
 from typing import Optional
-from google.cloud import pubsub_v1
 from src.settings import GCP_PROJECT_ID, PUBSUB_TOPIC_NAME
 
 
@@ -23,9 +23,21 @@ class Publisher:
         publisher.create_topic()
         publisher.publish_message("Hello, World!")
     ```
+
+    The client is created on first use and shared by every instance.
     """
     __topic_name__: str = f'projects/{GCP_PROJECT_ID}/topics/{PUBSUB_TOPIC_NAME}'
-    publisher = pubsub_v1.PublisherClient()
+    _client = None
+    _client_lock = threading.Lock()
+
+    @property
+    def publisher(self):
+        """The shared `PublisherClient`, created on first use."""
+        with Publisher._client_lock:
+            if Publisher._client is None:
+                from google.cloud import pubsub_v1
+                Publisher._client = pubsub_v1.PublisherClient()
+            return Publisher._client
 
     def create_topic(self, topic_name: str = __topic_name__):
         """
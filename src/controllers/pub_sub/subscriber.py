@@ -1,5 +1,4 @@
 import threading
-from google.cloud import pubsub_v1
 from src.settings import GCP_PROJECT_ID, PUBSUB_SUBSCRIPTION_NAME
 from src.controllers.pub_sub.processes import locked_callback_example
 
@@ -25,9 +24,21 @@ class Subscriber:
     class SubscriberConcurrent(Subscriber):
         . . .
     ```
+
+    The client is created on first use and shared by every instance.
     """
     __subscription_name__: str = f'projects/{GCP_PROJECT_ID}/subscriptions/{PUBSUB_SUBSCRIPTION_NAME}'
-    subscriber = pubsub_v1.SubscriberClient()
+    _client = None
+    _client_lock = threading.Lock()
+
+    @property
+    def subscriber(self):
+        """The shared `SubscriberClient`, created on first use."""
+        with Subscriber._client_lock:
+            if Subscriber._client is None:
+                from google.cloud import pubsub_v1
+                Subscriber._client = pubsub_v1.SubscriberClient()
+            return Subscriber._client
 
 
 class SubscriberQueue(Subscriber):
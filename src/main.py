@@ -7,6 +7,10 @@ __author__ = "Hector Vergara"
 __email__ = "hector.vergara@blend360.com"
 __version__ = "1.0"
 
+from time import perf_counter
+IMPORTS_STARTED = perf_counter()
+
+import asyncio
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
@@ -14,12 +18,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from src.services.ds_scripts.ds_model import load_model
 from src.controllers.api.application_apis import router as application_apis
 from src.controllers.api.message_apis import router as message_apis
+from src.controllers.api.diagnostics_apis import router as diagnostics_apis
+from src.controllers.api.health_apis import router as health_apis
+from src.controllers.api.middlewares import ReadYourWritesMiddleware, SqlProfilingMiddleware
+from src.connectors.sql_profiler import attach_engines
 from src.settings import (
     ENVIRONMENT,
     HOST,
-    PORT)
+    PORT,
+    SQL_PROFILING_ENABLED,
+    ASYNC_PROCESS_RETENTION_INTERVAL_SEC)
 from src.controllers.pub_sub.subscriber import SubscriberQueue
 from src.controllers.pub_sub.processes import async_process_core_callback
+from src.connectors.db_connect import db_health
+from src.connectors.long_process.async_process import AsyncProcess
+from src.utils.startup import STARTUP
 
 # 📌 Global variables for the application
 DS_MODEL = None
@@ -44,9 +57,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+
+if SQL_PROFILING_ENABLED:
+    attach_engines()
+    app.add_middleware(SqlProfilingMiddleware)
+
 # 📌 Add routers:
 app.include_router(application_apis)
 app.include_router(message_apis)
+app.include_router(diagnostics_apis)
+app.include_router(health_apis)
 
 # 📌 Error Handler:
 async def global_exception_handler(request: Request, exc: Exception):
@@ -58,26 +79,61 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.add_exception_handler(Exception, global_exception_handler)
 
 
-@app.on_event("startup")
-async def startup_event():
+STARTUP.record('imports', perf_counter() - IMPORTS_STARTED)
+
+IN_GREEN = '\033[92m'
+IN_BLUE = '\033[94m'
+RESET = '\033[0m'
+printing = lambda color, message: print(f"{color}{message}{RESET}")
+
+
+# 📌 Startup phases, run concurrently:
+async def load_ds_model():
     global DS_MODEL
-    IN_GREEN = '\033[92m'
-    IN_BLUE = '\033[94m'
-    RESET = '\033[0m'
-    printing = lambda color, message: print(f"{color}{message}{RESET}")
-    # Sequence:
-    # Print all your logs here:
-    printing(IN_GREEN, f"🔥 Welcome to a new instance of the Blend L&L example API service.")
     printing(IN_BLUE, 'Loading DS_MODEL . . .')
     DS_MODEL = await load_model()
-    printing(IN_GREEN, 'Done')
-    # Pubsub initialization:
+    printing(IN_GREEN, 'DS_MODEL loaded')
+
+
+async def check_database():
+    if not await asyncio.to_thread(db_health):
+        raise ConnectionError('Database unreachable')
+
+
+async def start_pubsub():
     printing(IN_BLUE, 'PUBSUB INITIALIZATION:')
     print('SubscriberQueue init. . .')
-    SubscriberQueue().run(callback=async_process_core_callback)
-    printing(IN_GREEN, 'Done')
+    queue = SubscriberQueue()
+    # Create the client here, so missing credentials fail this phase instead of the pulling thread:
+    await asyncio.to_thread(lambda: queue.subscriber)
+    queue.run(callback=async_process_core_callback)
     printing(IN_BLUE, 'PUBSUB_INITIALIZED')
-    printing(IN_GREEN, "🔥 All set!")
+
+
+async def run_startup():
+    await STARTUP.run(ds_model=load_ds_model, database=check_database, pubsub=start_pubsub)
+    if STARTUP.ready:
+        printing(IN_GREEN, "🔥 All set!")
+
+
+async def apply_retention_periodically():
+    # Archive or drop the old jobs of mge_async_process, see AsyncProcess.apply_retention:
+    while True:
+        try:
+            print('Async process retention:', await asyncio.to_thread(AsyncProcess.apply_retention))
+        except Exception as e:
+            print(f'Async process retention failed: {e}')
+        await asyncio.sleep(ASYNC_PROCESS_RETENTION_INTERVAL_SEC)
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Print all your logs here:
+    printing(IN_GREEN, f"🔥 Welcome to a new instance of the Blend L&L example API service.")
+    # The phases run in the background, so the server listens right away:
+    # /health/live/ answers at once and /health/ready/ once every phase is done.
+    app.state.startup = asyncio.create_task(run_startup())
+    app.state.retention = asyncio.create_task(apply_retention_periodically())
 
 
 if __name__ == "__main__":
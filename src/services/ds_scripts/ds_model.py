@@ -1,7 +1,9 @@
 import os
+import asyncio
 from time import sleep
 import dill
 import pathlib
+from src.settings import DS_MODEL_LOAD_DELAY_SEC
 
 BASE_DIR = pathlib.Path(os.path.dirname(os.path.abspath(__file__)))
 model_file_path = os.path.join(BASE_DIR, "model.pkl")
@@ -9,22 +11,43 @@ model_file_path = os.path.join(BASE_DIR, "model.pkl")
 # 📌 Codigo para generar el fake model:
 def model(number):
     return number ** 2
-with open(model_file_path, "wb") as f:
-    dill.dump(model, f)
 
 
-async def load_model():
+def create_model_file():
+    """Serialize the fake model into `model_file_path`. Run this module to regenerate it."""
+    with open(model_file_path, "wb") as f:
+        dill.dump(model, f)
+
+
+def read_model():
     """
-    Asynchronously loads a pre-trained model from a file.
+    Loads the pre-trained model from a file, blocking until it is read.
 
     The model is serialized using dill and stored in the file
-    specified by `model_file_path`. This function reads the file
-    and deserializes the model for use.
+    specified by `model_file_path`, which is created if missing or empty.
+    `DS_MODEL_LOAD_DELAY_SEC` simulates the loading time of a real model.
 
     Returns:
         callable: The deserialized model loaded from the file.
     """
-    sleep(10)
+    sleep(DS_MODEL_LOAD_DELAY_SEC)
+    if not os.path.exists(model_file_path) or not os.path.getsize(model_file_path):
+        create_model_file()
     with open(model_file_path, "rb") as f:
         loaded_model = dill.load(f)
-    return loaded_model
\ No newline at end of file
+    return loaded_model
+
+
+async def load_model():
+    """
+    Asynchronously loads the pre-trained model with `read_model`, in a worker
+    thread so the event loop keeps serving while it loads.
+
+    Returns:
+        callable: The deserialized model loaded from the file.
+    """
+    return await asyncio.to_thread(read_model)
+
+
+if __name__ == "__main__":
+    create_model_file()
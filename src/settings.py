@@ -21,6 +21,45 @@ POSTGRES_USER = os.getenv('POSTGRES_USER')
 POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 POSTGRES_HOST = os.getenv('POSTGRES_HOST') if os.getenv('on_docker') else 'localhost'
 DB_PORT = os.getenv('DB_PORT')
+# Connection budget of a worker per database, split between its sync and asyncio engines.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_ASYNC_POOL_PERCENT = int(os.getenv('DB_ASYNC_POOL_PERCENT', 50))
+DB_POOL_TIMEOUT_SEC = int(os.getenv('DB_POOL_TIMEOUT_SEC', 30))
+DB_POOL_RECYCLE_SEC = int(os.getenv('DB_POOL_RECYCLE_SEC', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true')
+DB_REPLICA_URLS = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
+DB_READ_YOUR_WRITES_SEC = int(os.getenv('DB_READ_YOUR_WRITES_SEC', 5))
+
+# Import settings:
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 10000))
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1024 * 1024))
+INSERT_CHUNK_SIZE = int(os.getenv('INSERT_CHUNK_SIZE', 1000))
+REFERENCE_INDEX_TTL_SEC = int(os.getenv('REFERENCE_INDEX_TTL_SEC', 60))
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', os.cpu_count() or 1))
+IMPORT_RANGE_SIZE = int(os.getenv('IMPORT_RANGE_SIZE', 16 * 1024 * 1024))
+
+# Export settings:
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 10000))
+
+# Report cache settings:
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', 256))
+REPORT_CACHE_REDIS_URL = os.getenv('REPORT_CACHE_REDIS_URL')
+REPORT_CACHE_TTL_SEC = int(os.getenv('REPORT_CACHE_TTL_SEC', 3600))
+# Entries of the in-process tier expire sooner, as writes on other workers do not invalidate them.
+REPORT_CACHE_LOCAL_TTL_SEC = int(os.getenv('REPORT_CACHE_LOCAL_TTL_SEC', 60))
+
+# In-memory analytics settings:
+HIRES_ANALYTICS_ENABLED = os.getenv('HIRES_ANALYTICS_ENABLED', 'false').lower() in ('1', 'true')
+HIRES_ANALYTICS_TTL_SEC = int(os.getenv('HIRES_ANALYTICS_TTL_SEC', 3600))
+
+# Startup settings:
+DS_MODEL_LOAD_DELAY_SEC = int(os.getenv('DS_MODEL_LOAD_DELAY_SEC', 10))
+
+# SQL profiling settings:
+SQL_PROFILING_ENABLED = os.getenv('SQL_PROFILING_ENABLED', 'false').lower() in ('1', 'true')
+SQL_PROFILING_SLOWEST = int(os.getenv('SQL_PROFILING_SLOWEST', 5))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 10))
 
 
 # PUB/SUB Config
@@ -31,6 +70,18 @@ WATCHDOG_MONITOR_INTERVAL_SEC = 600
 JOB_MAX_ATTEMPTS = 3
 JOB_TIMEOUT_SEC = 3600
 
+# Async process retention settings:
+ASYNC_PROCESS_RETENTION_DAYS = int(os.getenv('ASYNC_PROCESS_RETENTION_DAYS', 30))
+ASYNC_PROCESS_RETENTION_MODE = os.getenv('ASYNC_PROCESS_RETENTION_MODE', 'archive')
+ASYNC_PROCESS_ARCHIVE_DAYS = int(os.getenv('ASYNC_PROCESS_ARCHIVE_DAYS', 365))
+ASYNC_PROCESS_PARTITIONS_AHEAD = int(os.getenv('ASYNC_PROCESS_PARTITIONS_AHEAD', 2))
+ASYNC_PROCESS_RETENTION_INTERVAL_SEC = int(os.getenv('ASYNC_PROCESS_RETENTION_INTERVAL_SEC', 86400))
+
+# Server-sent events settings:
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv('SSE_CLIENT_QUEUE_SIZE', 100))
+SSE_HEARTBEAT_SEC = int(os.getenv('SSE_HEARTBEAT_SEC', 15))
+SSE_POLL_INTERVAL_SEC = int(os.getenv('SSE_POLL_INTERVAL_SEC', 30))
+
 # Deepseek ENV:
 DEEPSEEK_PORT=os.getenv('DEEPSEEK_PORT', '11434')
 DEEPSEEK_HOST=os.getenv('DEEPSEEK_HOST', 'localhost')
@@ -0,0 +1,64 @@
+import asyncio
+from time import perf_counter
+
+
+class StartupReport:
+    """
+    Phases of the startup of the instance and their timings.
+
+    The phases run concurrently in the background once the server is listening, so liveness
+    probes are answered right away, and the instance is ready once every phase has succeeded.
+
+    Usage example:
+    --------------
+    ```
+        STARTUP.record('imports', seconds)
+        await STARTUP.run(ds_model=load_ds_model, database=check_database)
+        STARTUP.ready
+    ```
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.done = False
+        self.total_ms = None
+
+    def record(self, name: str, seconds: float, status: str = 'ok', error: str = None):
+        """Record a phase measured elsewhere, e.g. the import time of the application."""
+        self.phases[name] = {'status': status, 'duration_ms': round(seconds * 1000, 1), 'error': error}
+
+    async def run(self, **steps):
+        """Run the coroutine functions in `steps` concurrently, timing each one as a phase."""
+        start = perf_counter()
+        for name in steps:
+            self.phases[name] = {'status': 'running', 'duration_ms': None, 'error': None}
+        await asyncio.gather(*[self._phase(name, step) for name, step in steps.items()])
+        self.total_ms = round((perf_counter() - start) * 1000, 1)
+        self.done = True
+        self.print_report()
+
+    async def _phase(self, name: str, step):
+        start = perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            self.record(name, perf_counter() - start, 'failed', str(e))
+        else:
+            self.record(name, perf_counter() - start)
+
+    @property
+    def ready(self) -> bool:
+        return self.done and all(phase['status'] == 'ok' for phase in self.phases.values())
+
+    def to_dict(self) -> dict:
+        return {'ready': self.ready, 'total_ms': self.total_ms, 'phases': self.phases}
+
+    def print_report(self):
+        print('Startup report:')
+        for name, phase in self.phases.items():
+            error = f" ({phase['error']})" if phase['error'] else ''
+            print(f"    {name:<12}{phase['status']:<8}{phase['duration_ms']:>10} ms{error}")
+        print(f"    {'total':<20}{self.total_ms:>10} ms")
+
+
+STARTUP = StartupReport()
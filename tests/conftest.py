@@ -0,0 +1,4 @@
+import os
+
+# The connectors create their engines on import, which needs a valid port; the unit tests open no connection.
+os.environ.setdefault('DB_PORT', '5432')
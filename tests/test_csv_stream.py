@@ -0,0 +1,59 @@
+import asyncio
+import io
+from src.connectors.application_tables.csv_stream import iter_csv_batches
+
+
+class Upload:
+    """Minimal async `UploadFile` reading from bytes."""
+
+    def __init__(self, content: bytes):
+        self.file = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+
+def collect(iterator) -> list:
+    async def run():
+        return [item async for item in iterator]
+    return asyncio.run(run())
+
+
+def test_rows_split_between_chunks():
+    content = b'1,Ana\n2,Luis\n3,Marta\n'
+    for chunk_size in (1, 2, 5, 1024):
+        batches = collect(iter_csv_batches(Upload(content), chunk_size=chunk_size))
+        assert batches == [[['1', 'Ana'], ['2', 'Luis'], ['3', 'Marta']]]
+
+
+def test_last_row_without_line_break():
+    assert collect(iter_csv_batches(Upload(b'1,Ana\n2,Luis'), chunk_size=4)) == [[['1', 'Ana'], ['2', 'Luis']]]
+
+
+def test_crlf_line_breaks():
+    batches = collect(iter_csv_batches(Upload(b'1,Ana\r\n2,Luis\r\n'), chunk_size=3))
+    assert batches == [[['1', 'Ana'], ['2', 'Luis']]]
+
+
+def test_quoted_line_breaks_are_kept():
+    content = b'1,"first\nsecond"\n2,"a ""quoted"" one"\n'
+    for chunk_size in (1, 4, 1024):
+        batches = collect(iter_csv_batches(Upload(content), chunk_size=chunk_size))
+        assert batches == [[['1', 'first\nsecond'], ['2', 'a "quoted" one']]]
+
+
+def test_multibyte_characters_split_between_chunks():
+    content = '1,Peñalolén\n2,Zürich\n3,東京\n'.encode()
+    for chunk_size in (1, 2, 3):
+        batches = collect(iter_csv_batches(Upload(content), chunk_size=chunk_size))
+        assert batches == [[['1', 'Peñalolén'], ['2', 'Zürich'], ['3', '東京']]]
+
+
+def test_batches_skip_empty_lines():
+    content = b'1,a\n\n2,b\n3,c\n\n4,d\n5,e\n'
+    batches = collect(iter_csv_batches(Upload(content), batch_size=2, chunk_size=3))
+    assert batches == [[['1', 'a'], ['2', 'b']], [['3', 'c'], ['4', 'd']], [['5', 'e']]]
+
+
+def test_empty_file():
+    assert collect(iter_csv_batches(Upload(b''))) == []
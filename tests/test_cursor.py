@@ -0,0 +1,18 @@
+from datetime import datetime
+import pytest
+from src.connectors.long_process.base import decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    values = [datetime(2024, 2, 29, 23, 59, 59, 123456), b'\x00\xffid', 42, 'name', None]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+def test_token_is_url_safe():
+    token = encode_cursor([b'\xfb\xff' * 10, 'a/b+c?'])
+    assert all(character.isalnum() or character in '-_=' for character in token)
+
+
+def test_invalid_token():
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
@@ -0,0 +1,36 @@
+import asyncio
+from pydantic import BaseModel
+from src.connectors.application_tables.ndjson_stream import iter_ndjson_batches, iter_ndjson_lines
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+async def chunked(content: bytes, size: int):
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+def collect(iterator) -> list:
+    async def run():
+        return [item async for item in iterator]
+    return asyncio.run(run())
+
+
+def test_lines_split_between_chunks():
+    content = '{"id": 1, "name": "Ñuñoa"}\n\n{"id": 2, "name": "東京"}'.encode()
+    for size in (1, 2, 7, 1024):
+        assert collect(iter_ndjson_lines(chunked(content, size))) == ['{"id": 1, "name": "Ñuñoa"}', '{"id": 2, "name": "東京"}']
+
+
+def test_batches_report_invalid_lines():
+    content = b'{"id": 1, "name": "a"}\nnot json\n{"id": "x", "name": "b"}\n{"id": 4, "name": "d"}\n'
+    batches = collect(iter_ndjson_batches(chunked(content, 5), Item, batch_size=2))
+    assert [[model.id for model in models] for models, _ in batches] == [[1], [4]]
+    assert [[invalid['line'] for invalid in invalids] for _, invalids in batches] == [[2], [3]]
+
+
+def test_empty_stream():
+    assert collect(iter_ndjson_batches(chunked(b'', 1), Item)) == []
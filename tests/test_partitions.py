@@ -0,0 +1,23 @@
+from datetime import datetime
+from src.connectors.long_process.partitions import MonthlyPartitions, add_months, month_start, next_month
+
+
+def test_month_start():
+    assert month_start(datetime(2024, 2, 29, 23, 59, 59)) == datetime(2024, 2, 1)
+
+
+def test_next_month_rolls_over_the_year():
+    assert next_month(datetime(2024, 11, 1)) == datetime(2024, 12, 1)
+    assert next_month(datetime(2024, 12, 1)) == datetime(2025, 1, 1)
+
+
+def test_add_months():
+    assert add_months(datetime(2024, 1, 31, 12), 0) == datetime(2024, 1, 1)
+    assert add_months(datetime(2024, 1, 31, 12), 1) == datetime(2024, 2, 1)
+    assert add_months(datetime(2024, 11, 15), 3) == datetime(2025, 2, 1)
+
+
+def test_partition_names():
+    partitions = MonthlyPartitions('events', 'created_at')
+    assert partitions.name(datetime(2024, 3, 1)) == 'events_p202403'
+    assert partitions.default == 'events_default'
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+from src.connectors.statement_cache import StatementCache, where_clauses, where_key, where_params
+
+users = Table('users', MetaData(), Column('id', Integer, primary_key=True), Column('name', String))
+
+
+def test_builds_once_per_key():
+    cache, built = StatementCache(), []
+
+    def build():
+        built.append(1)
+        return select(users)
+
+    first = cache.get(('users', 'all'), build)
+    assert cache.get(('users', 'all'), build) is first
+    assert cache.get(('users', 'other'), build) is not first
+    assert len(built) == 2
+    assert cache.to_dict() == {'statements': 2, 'hits': 1, 'misses': 2, 'hit_rate': 0.3333}
+
+
+def test_clear():
+    cache = StatementCache()
+    cache.get(('users',), lambda: select(users))
+    cache.clear()
+    assert cache.to_dict() == {'statements': 0, 'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+
+
+def test_where_clauses_use_bind_parameters():
+    criteria = {'name': 'rk', 'id': None}
+    stmt = select(users).where(*where_clauses(users.c, criteria))
+    sql = str(stmt.compile())
+    assert 'users.id IS NULL' in sql and 'users.name = :w_name' in sql
+    assert where_params(criteria) == {'w_name': 'rk'}
+
+
+def test_where_key_depends_on_shape_only():
+    assert where_key({'name': 'a', 'id': 1}) == where_key({'id': 2, 'name': 'b'})
+    assert where_key({'name': 'a'}) != where_key({'name': None})